@@ -1,6 +1,16 @@
 from flask import Flask,send_from_directory,session
 from flask_login import LoginManager
-from models import User, db
+from models import User, db, add_missing_columns, create_missing_indexes
+from voter_bitmap import voter_bitmaps
+from session_store import server_sessions
+from assets import assets
+from archive import vote_archive
+from db_routing import read_replica
+from profiling import request_profiler
+from poll_import import load_definitions, import_polls, PollImportError
+import click
+from flask.cli import AppGroup
+import ledger
 from datetime import datetime, timedelta
 from routes.user_routes import user_bp
 from routes.admin_routes import admin_bp
@@ -10,10 +20,33 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your_secret_key_here'
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///voting.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SESSION_BACKEND'] = 'sqlite'
+# Keeps admin sessions active for 6 hours
+app.permanent_session_lifetime = timedelta(hours=6)
+# Allow overrides such as FLASK_SQLALCHEMY_DATABASE_URI from the environment
+app.config.from_prefixed_env()
 
 # Initialize DB
 db.init_app(app)
 
+# Snapshot/replica connection for read-only results endpoints
+read_replica.init_app(app, db)
+
+# Server-side sessions: the cookie only carries the session id
+server_sessions.init_app(app)
+
+# Fingerprinted CSS/JS served with long-lived caching
+assets.init_app(app)
+
+# Compressed array files for the votes of long-closed polls
+vote_archive.init_app(app)
+
+# Per-poll "has voted" bitmaps (shared between workers via mmap)
+voter_bitmaps.init_app(app)
+
+# Opt-in request profiling (X-Profile header for admins, or PROFILING_SAMPLE_RATE)
+request_profiler.init_app(app, db)
+
 # Setup login manager
 login_manager = LoginManager()
 login_manager.login_view = 'auth.login'
@@ -25,10 +58,9 @@ def load_user(user_id):
 
 @admin_bp.before_request
 def make_session_permanent():
-    session.permanent = True
-    session.modified = True
-    # Keeps session active for 6 hours
-    admin_bp.permanent_session_lifetime = timedelta(hours=6)
+    # Only mark the session once; the store slides the expiry forward itself
+    if not session.permanent:
+        session.permanent = True
 
 
 
@@ -47,12 +79,87 @@ app.register_blueprint(auth_bp)
 # ✅ Create tables automatically if missing
 with app.app_context():
     db.create_all()
+    add_missing_columns()
+    create_missing_indexes()
+    voter_bitmaps.rebuild_all()
+
+
+@app.cli.command('verify-bitmaps')
+def verify_bitmaps():
+    """Check the voter bitmaps against the vote table."""
+    problems = voter_bitmaps.verify()
+    if not problems:
+        print("✅ Voter bitmaps match the vote table.")
+        return
+    for poll_id, diff in problems.items():
+        print(f"❌ Poll {poll_id}: missing {diff['missing']}, extra {diff['extra']}")
+    voter_bitmaps.rebuild_all()
+    print("Bitmaps rebuilt from the vote table.")
+
+@app.cli.command('import-polls')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--dry-run', is_flag=True, help='Validate only, write nothing.')
+def import_polls_command(path, dry_run):
+    """Create polls and candidates from a JSON or YAML file."""
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    try:
+        summary = import_polls(load_definitions(text, path), dry_run=dry_run)
+    except PollImportError as e:
+        for error in e.errors:
+            print(f"❌ {error}")
+        raise SystemExit(1)
+    verb = "Would import" if dry_run else "✅ Imported"
+    print(f"{verb} {summary['polls']} polls with {summary['candidates']} candidates.")
+
+ledger_cli = AppGroup('ledger', help='Tamper-evident vote ledger.')
+
+@ledger_cli.command('verify')
+@click.option('--poll', 'poll_id', type=int, help='Only verify this poll.')
+@click.option('--full', is_flag=True, help='Re-hash every block, not just new ones.')
+@click.option('--workers', type=int, help='Worker processes (default: all cores).')
+def ledger_verify(poll_id, full, workers):
+    """Check the hash chains and the vote table against each other."""
+    report = ledger.verify(poll_id=poll_id, full=full, workers=workers)
+    for pid, result in report['polls'].items():
+        status = "✅" if not result['problems'] else "❌"
+        checked = "archive checked" if result['archived'] else f"{result['blocks']} block(s) checked"
+        print(f"{status} Poll {pid}: {checked}")
+        for problem in result['problems']:
+            print(f"   {problem}")
+    print(f"Finished in {report['seconds']}s")
+    if not report['ok']:
+        raise SystemExit(1)
+
+@ledger_cli.command('backfill')
+def ledger_backfill():
+    """Add votes cast before the ledger existed."""
+    print(f"✅ Added {ledger.backfill()} vote(s) to the ledger.")
+
+app.cli.add_command(ledger_cli)
+
+@app.cli.command('archive-polls')
+@click.option('--days', type=float, help='Override ARCHIVE_AFTER_DAYS for this run.')
+def archive_polls_command(days):
+    """Move votes of long-closed polls into compressed archive files."""
+    if days is not None:
+        vote_archive.after = timedelta(days=days)
+    results = vote_archive.archive_due()
+    if not results:
+        print("Nothing to archive.")
+    for poll_id, result in results.items():
+        if isinstance(result, int):
+            print(f"✅ Poll {poll_id}: archived {result} vote(s)")
+        else:
+            print(f"❌ Poll {poll_id}: {result}")
+
 @app.route('/favicon.ico')
 def favicon():
     return send_from_directory(
         os.path.join(app.root_path, 'static'),
         'favicon.ico',
-        mimetype='image/vnd.microsoft.icon'
+        mimetype='image/vnd.microsoft.icon',
+        max_age=7 * 24 * 3600
     )
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,335 @@
+import os
+import struct
+from collections import Counter
+from datetime import datetime, timedelta
+
+import numpy as np
+import xxhash
+import zstandard
+from sqlalchemy import delete, select
+
+import ledger
+from fileutil import write_atomic
+from models import db, Poll, Candidate, Vote, LedgerEntry, LedgerCheckpoint, PollArchive, ArchivedTally
+
+
+# ------------------------------
+# Archive File Layout
+# ------------------------------
+# poll_<id>.zst is a zstd frame holding a header (magic, version, vote count,
+# ledger entry count; 24 bytes) followed by these arrays, widest first so each
+# one stays aligned:
+#   timestamp        int64[votes]    microseconds since the Unix epoch (UTC)
+#   entry timestamp  int64[entries]
+#   vote id          int32[votes]
+#   candidate        int32[votes]
+#   user             int32[votes]
+#   entry vote id    int32[entries]
+#   entry user       int32[entries]
+#   entry candidate  int32[entries]
+#   entry kind       uint8[entries]  0 = vote, 1 = deleted
+# Votes are stored in the order they were cast, ledger entries in chain order,
+# so the chain head kept in poll_archive can be recomputed from the file.
+# To read, the frame is unpacked once into cache/poll_<id>.bin and the arrays
+# are memory-mapped from there.
+MAGIC = b'VARC'
+VERSION = 2
+HEADER = struct.Struct('<4sIQQ')
+EPOCH = datetime(1970, 1, 1)
+NO_TIME = np.iinfo(np.int64).min
+KINDS = (ledger.VOTE, ledger.DELETED)
+FIELDS = (
+    # (attribute, dtype, True for per-entry arrays)
+    ('timestamps', '<i8', False),
+    ('entry_timestamps', '<i8', True),
+    ('vote_ids', '<i4', False),
+    ('candidate_ids', '<i4', False),
+    ('user_ids', '<i4', False),
+    ('entry_vote_ids', '<i4', True),
+    ('entry_user_ids', '<i4', True),
+    ('entry_candidate_ids', '<i4', True),
+    ('entry_kinds', 'u1', True),
+)
+
+
+class ArchiveError(Exception):
+    """Raised when a poll cannot be archived or its archive file is damaged."""
+
+
+def _micros(timestamp):
+    return NO_TIME if timestamp is None else (timestamp - EPOCH) // timedelta(microseconds=1)
+
+
+def _datetime(micros):
+    return None if micros == NO_TIME else EPOCH + timedelta(microseconds=micros)
+
+
+def _file_checksum(path):
+    digest = xxhash.xxh64()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ArchivedVotes:
+    """Memory-mapped, read-only view of an archived poll's votes and ledger entries."""
+
+    def __init__(self, path):
+        raw = np.memmap(path, dtype=np.uint8, mode='r')
+        magic, version, count, entries = HEADER.unpack_from(raw[:HEADER.size].tobytes())
+        if magic != MAGIC or version != VERSION:
+            raise ArchiveError(f"{path} is not a vote archive")
+        offset = HEADER.size
+        for name, dtype, per_entry in FIELDS:
+            n = entries if per_entry else count
+            array = np.frombuffer(raw, dtype=dtype, count=n, offset=offset)
+            setattr(self, name, array)
+            offset += array.nbytes
+        self._raw = raw
+
+    def __len__(self):
+        return len(self.candidate_ids)
+
+    def tally(self):
+        ids, counts = np.unique(self.candidate_ids, return_counts=True)
+        return dict(zip(ids.tolist(), counts.tolist()))
+
+    def rows(self):
+        """Yield (user_id, candidate_id, timestamp) like the vote table would."""
+        for user_id, candidate_id, micros in zip(
+            self.user_ids.tolist(), self.candidate_ids.tolist(), self.timestamps.tolist()
+        ):
+            yield user_id, candidate_id, _datetime(micros)
+
+    def votes(self):
+        """Vote id -> (user_id, candidate_id, timestamp)."""
+        return {
+            vote_id: (user_id, candidate_id, _datetime(micros))
+            for vote_id, user_id, candidate_id, micros in zip(
+                self.vote_ids.tolist(), self.user_ids.tolist(),
+                self.candidate_ids.tolist(), self.timestamps.tolist(),
+            )
+        }
+
+    def ledger_entries(self):
+        """Yield the poll's ledger entries as (kind, vote_id, user_id, candidate_id, timestamp)."""
+        for kind, vote_id, user_id, candidate_id, micros in zip(
+            self.entry_kinds.tolist(), self.entry_vote_ids.tolist(), self.entry_user_ids.tolist(),
+            self.entry_candidate_ids.tolist(), self.entry_timestamps.tolist(),
+        ):
+            yield KINDS[kind], vote_id, user_id, candidate_id, _datetime(micros)
+
+
+def _pack(votes, entries):
+    """Archive bytes for (id, candidate_id, user_id, timestamp) votes and
+    (kind, vote_id, user_id, candidate_id, timestamp) ledger entries."""
+    columns = {
+        'vote_ids': [v[0] for v in votes],
+        'candidate_ids': [v[1] for v in votes],
+        'user_ids': [v[2] for v in votes],
+        'timestamps': [_micros(v[3]) for v in votes],
+        'entry_kinds': [KINDS.index(e[0]) for e in entries],
+        'entry_vote_ids': [e[1] for e in entries],
+        'entry_user_ids': [e[2] for e in entries],
+        'entry_candidate_ids': [e[3] for e in entries],
+        'entry_timestamps': [_micros(e[4]) for e in entries],
+    }
+    return HEADER.pack(MAGIC, VERSION, len(votes), len(entries)) + b''.join(
+        np.asarray(columns[name], dtype=dtype).tobytes() for name, dtype, _ in FIELDS
+    )
+
+
+# ------------------------------
+# Vote Archive
+# ------------------------------
+class VoteArchive:
+    """Moves votes of long-closed polls out of the live vote table.
+
+    Config:
+        ARCHIVE_DIR          defaults to <instance>/archive
+        ARCHIVE_AFTER_DAYS   polls closed longer than this are archived (default 30)
+    """
+
+    def __init__(self, app=None):
+        self.directory = None
+        self.after = timedelta(days=30)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ARCHIVE_DIR', os.path.join(app.instance_path, 'archive'))
+        app.config.setdefault('ARCHIVE_AFTER_DAYS', 30)
+        self.directory = app.config['ARCHIVE_DIR']
+        self.after = timedelta(days=float(app.config['ARCHIVE_AFTER_DAYS']))
+        os.makedirs(os.path.join(self.directory, 'cache'), exist_ok=True)
+        app.extensions['vote_archive'] = self
+
+    def _path(self, poll_id):
+        return os.path.join(self.directory, f'poll_{poll_id}.zst')
+
+    def _cache_path(self, poll_id):
+        return os.path.join(self.directory, 'cache', f'poll_{poll_id}.bin')
+
+    def due(self, now=None):
+        """Ids of closed polls old enough to archive."""
+        cutoff = (now or datetime.utcnow()) - self.after
+        return [
+            poll_id for (poll_id,) in
+            db.session.query(Poll.id)
+            .filter(Poll.end_time < cutoff, Poll.id.not_in(select(PollArchive.poll_id)))
+            .order_by(Poll.id)
+        ]
+
+    def archive_poll(self, poll_id):
+        """Archive one poll's votes; returns the number of votes moved."""
+        poll_id = int(poll_id)
+        if db.session.get(PollArchive, poll_id):
+            raise ArchiveError(f"poll {poll_id} is already archived")
+
+        if db.session.query(LedgerEntry.id).filter_by(poll_id=poll_id).first():
+            report = ledger.verify(poll_id=poll_id, full=True, workers=1)
+            if not report['ok']:
+                raise ArchiveError(f"poll {poll_id} failed ledger verification; not archiving")
+        head = (
+            db.session.query(LedgerEntry.entry_hash)
+            .filter_by(poll_id=poll_id)
+            .order_by(LedgerEntry.seq.desc())
+            .limit(1)
+            .scalar()
+        )
+
+        votes = (
+            db.session.query(Vote.id, Vote.candidate_id, Vote.user_id, Vote.timestamp)
+            .filter(Vote.poll_id == poll_id)
+            .order_by(Vote.id)
+            .all()
+        )
+        entries = (
+            db.session.query(LedgerEntry.kind, LedgerEntry.vote_id, LedgerEntry.user_id,
+                             LedgerEntry.candidate_id, LedgerEntry.timestamp)
+            .filter(LedgerEntry.poll_id == poll_id)
+            .order_by(LedgerEntry.seq)
+            .all()
+        )
+
+        raw = _pack(votes, entries)
+        path = self._path(poll_id)
+        write_atomic(path, zstandard.ZstdCompressor(level=19).compress(raw))
+
+        tally = Counter(candidate_id for _, candidate_id, _, _ in votes)
+        candidates = [c for (c,) in db.session.query(Candidate.id).filter_by(poll_id=poll_id)]
+        no_sync = {'synchronize_session': False}
+        try:
+            db.session.add(PollArchive(
+                poll_id=poll_id,
+                vote_count=len(votes),
+                filename=os.path.basename(path),
+                checksum=xxhash.xxh64(raw).hexdigest(),
+                ledger_head=head,
+            ))
+            db.session.add_all(
+                ArchivedTally(poll_id=poll_id, candidate_id=c, votes=tally.get(c, 0))
+                for c in candidates
+            )
+            db.session.execute(delete(Vote).where(Vote.poll_id == poll_id), execution_options=no_sync)
+            # The chain was verified above; its entries are in the file and
+            # its head is kept with the record, so check() can recompute it
+            db.session.execute(delete(LedgerEntry).where(LedgerEntry.poll_id == poll_id), execution_options=no_sync)
+            db.session.execute(delete(LedgerCheckpoint).where(LedgerCheckpoint.poll_id == poll_id), execution_options=no_sync)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            os.remove(path)
+            raise
+        return len(votes)
+
+    def archive_due(self, now=None):
+        """Archive every poll past the window; returns {poll_id: votes moved or error}."""
+        results = {}
+        for poll_id in self.due(now):
+            try:
+                results[poll_id] = self.archive_poll(poll_id)
+            except ArchiveError as e:
+                results[poll_id] = str(e)
+        return results
+
+    def _unpack(self, record):
+        with open(os.path.join(self.directory, record.filename), 'rb') as f:
+            raw = zstandard.ZstdDecompressor().decompress(f.read())
+        if xxhash.xxh64(raw).hexdigest() != record.checksum:
+            raise ArchiveError(f"archive for poll {record.poll_id} is damaged")
+        return raw
+
+    def open(self, poll_id):
+        """Memory-map an archived poll's votes, unpacking the archive when needed.
+
+        The unpacked cache is checksummed on every open (one xxhash pass) and
+        unpacked again if it no longer matches.
+        """
+        record = db.session.get(PollArchive, int(poll_id))
+        if record is None:
+            return None
+        cache = self._cache_path(record.poll_id)
+        if os.path.exists(cache) and _file_checksum(cache) != record.checksum:
+            print(f"Archive cache for poll {record.poll_id} was altered; unpacking it again")
+            os.remove(cache)
+        if not os.path.exists(cache):
+            write_atomic(cache, self._unpack(record))
+        return ArchivedVotes(cache)
+
+    def check(self, poll_id, full=False):
+        """Check an archived poll against its record; returns a list of problems.
+
+        Always compares the archive file and its unpacked cache with the stored
+        checksum, and the archived tally and vote count with the votes in the
+        file. With ``full``, the ledger chain kept in the file is re-hashed and
+        compared with the recorded head, and the votes with what the chain says
+        they should be.
+        """
+        record = db.session.get(PollArchive, int(poll_id))
+        label = f"poll {record.poll_id} archive"
+        cache = self._cache_path(record.poll_id)
+        problems = []
+        try:
+            raw = self._unpack(record)
+        except (OSError, zstandard.ZstdError, ArchiveError) as e:
+            return [f"{label}: {e}"]
+        if not os.path.exists(cache) or _file_checksum(cache) != record.checksum:
+            if os.path.exists(cache):
+                problems.append(f"{label}: unpacked cache was altered; unpacked it again")
+            write_atomic(cache, raw)
+        archived = ArchivedVotes(cache)
+
+        if len(archived) != record.vote_count:
+            problems.append(f"{label}: holds {len(archived)} vote(s), record says {record.vote_count}")
+        counts = archived.tally()
+        tally = {
+            candidate_id: votes for candidate_id, votes in
+            db.session.query(ArchivedTally.candidate_id, ArchivedTally.votes).filter_by(poll_id=record.poll_id)
+        }
+        for candidate_id in sorted(counts.keys() | tally.keys()):
+            if counts.get(candidate_id, 0) != tally.get(candidate_id, 0):
+                problems.append(f"{label}: candidate {candidate_id} has {tally.get(candidate_id, 0)} "
+                                f"vote(s) in the tally, {counts.get(candidate_id, 0)} in the archive")
+
+        if full and (record.ledger_head is not None or len(archived.entry_kinds)):
+            entries = list(archived.ledger_entries())
+            if ledger.chain_head(record.poll_id, entries) != record.ledger_head:
+                problems.append(f"{label}: ledger chain does not match the recorded head")
+            expected = ledger.live_votes(entries)
+            actual = archived.votes()
+            problems.extend(
+                f"{label}: vote {vote_id} differs from the ledger"
+                for vote_id in sorted(expected.keys() | actual.keys())
+                if expected.get(vote_id) != actual.get(vote_id)
+            )
+        return problems
+
+    def remove_files(self, poll_id):
+        for path in (self._path(poll_id), self._cache_path(poll_id)):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+vote_archive = VoteArchive()
@@ -0,0 +1,101 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+from flask import abort, request, send_file, url_for
+
+from fileutil import write_atomic
+
+try:
+    import zstandard
+except ImportError:  # zstd variants are skipped, gzip still works
+    zstandard = None
+
+
+# ------------------------------
+# Fingerprinted Static Assets
+# ------------------------------
+# CSS/JS under static/css and static/js are copied to static/dist with a
+# content hash in the name (admin_dashboard.3f2a9c1d.css) plus .gz/.zst
+# siblings. Because the URL changes whenever the content does, the files can
+# be cached by browsers forever.
+ASSET_DIRS = ('css', 'js')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+ENCODINGS = (('zstd', '.zst'), ('gzip', '.gz'))
+
+
+def build_assets(static_dir, dist_dir):
+    """Fingerprint and precompress every asset; returns the manifest."""
+    os.makedirs(dist_dir, exist_ok=True)
+    manifest = {}
+    for sub in ASSET_DIRS:
+        src_dir = os.path.join(static_dir, sub)
+        if not os.path.isdir(src_dir):
+            continue
+        for name in sorted(os.listdir(src_dir)):
+            with open(os.path.join(src_dir, name), 'rb') as f:
+                data = f.read()
+            stem, ext = os.path.splitext(name)
+            hashed = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+            manifest[f'{sub}/{name}'] = hashed
+
+            target = os.path.join(dist_dir, hashed)
+            if os.path.exists(target):
+                continue
+            write_atomic(target + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+            if zstandard is not None:
+                write_atomic(target + '.zst', zstandard.ZstdCompressor(level=19).compress(data))
+            write_atomic(target, data)
+
+    write_atomic(os.path.join(dist_dir, 'manifest.json'),
+                  json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+class Assets:
+    """Builds fingerprinted assets at startup and serves them with long-lived caching.
+
+    Templates use ``{{ asset_url('css/login.css') }}``.
+    """
+
+    def __init__(self, app=None):
+        self.manifest = {}
+        self.dist_dir = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ASSETS_DIST_DIR', os.path.join(app.static_folder, 'dist'))
+        self.dist_dir = app.config['ASSETS_DIST_DIR']
+        self.manifest = build_assets(app.static_folder, self.dist_dir)
+
+        app.add_url_rule('/assets/<path:filename>', 'assets', self.serve)
+        app.jinja_env.globals['asset_url'] = self.url
+        app.extensions['assets'] = self
+
+    def url(self, logical_name):
+        return url_for('assets', filename=self.manifest[logical_name])
+
+    def serve(self, filename):
+        if filename not in self.manifest.values():
+            abort(404)
+        path = os.path.join(self.dist_dir, filename)
+        mimetype = mimetypes.guess_type(filename)[0]
+
+        encoding = None
+        for name, suffix in ENCODINGS:
+            if name in request.accept_encodings and os.path.exists(path + suffix):
+                encoding, path = name, path + suffix
+                break
+
+        response = send_file(path, mimetype=mimetype, conditional=True, etag=True)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Cache-Control'] = IMMUTABLE
+        response.vary.add('Accept-Encoding')
+        return response
+
+
+assets = Assets()
@@ -0,0 +1,302 @@
+"""Ad-hoc benchmarks against a scratch copy of the app.
+
+Usage: python bench.py <benchmark> [options]   (see --help)
+
+Each run points the app at a temporary database/instance files through
+FLASK_* environment variables, so the real voting.db is never touched.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def scratch_app(tmp=None):
+    """Import the app configured against a scratch directory (fresh if not given).
+
+    Also used by the test suite's ``app`` fixture.
+    """
+    tmp = tmp or tempfile.mkdtemp(prefix='voting-bench-')
+    os.environ['FLASK_SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(tmp, 'voting.db')
+    os.environ['FLASK_VOTER_BITMAP_DIR'] = os.path.join(tmp, 'bitmaps')
+    os.environ['FLASK_SESSION_SQLITE_PATH'] = os.path.join(tmp, 'sessions.db')
+    os.environ['FLASK_ASSETS_DIST_DIR'] = os.path.join(tmp, 'dist')
+    os.environ['FLASK_ARCHIVE_DIR'] = os.path.join(tmp, 'archive')
+    os.environ['FLASK_READ_REPLICA_PATH'] = os.path.join(tmp, 'replica', 'voting.db')
+    os.environ['FLASK_PROFILING_DIR'] = os.path.join(tmp, 'profiles')
+    from app import app
+    app.config['TESTING'] = True
+    return app
+
+
+def _seed_admin(app, polls=1, candidates=5):
+    from werkzeug.security import generate_password_hash
+    from models import db, User, Poll, Candidate
+
+    with app.app_context():
+        db.session.add(User(username='bench_admin', email='bench@example.com', phone='0',
+                            password=generate_password_hash('bench'), role='admin'))
+        now = datetime.utcnow()
+        poll_ids = []
+        for i in range(polls):
+            poll = Poll(title=f'Bench poll {i}', start_time=now, end_time=now + timedelta(days=1))
+            poll.candidates = [Candidate(name=f'Candidate {j}') for j in range(candidates)]
+            db.session.add(poll)
+            db.session.flush()
+            poll_ids.append(poll.id)
+        db.session.commit()
+    return poll_ids
+
+
+def _login(client):
+    client.post('/login', data={'username': 'bench_admin', 'password': 'bench'})
+
+
+def _timed(fn, n):
+    times = []
+    result = None
+    for _ in range(n):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return times, result
+
+
+# ------------------------------
+# Sessions
+# ------------------------------
+def bench_sessions(args):
+    """Admin dashboard polling loop: cookie sessions vs the server-side store."""
+    from flask import session
+    from flask.sessions import SecureCookieSessionInterface
+
+    app = scratch_app()
+    poll_id = _seed_admin(app)[0]
+    server_interface = app.session_interface
+    legacy = {'on': False}
+
+    @app.before_request
+    def force_cookie_rewrite():
+        # What make_session_permanent used to do on every admin request
+        if legacy['on']:
+            session.modified = True
+
+    for label, interface, force in (
+        ('signed cookie (old)', SecureCookieSessionInterface(), True),
+        (f"server-side ({app.config['SESSION_BACKEND']})", server_interface, False),
+    ):
+        app.session_interface = interface
+        legacy['on'] = force
+        client = app.test_client()
+        _login(client)
+        client.get('/admin/dashboard')
+
+        responses = []
+
+        def poll():
+            response = client.get(f'/admin/poll_stats/{poll_id}')
+            responses.append(response)
+            return response
+
+        times, _ = _timed(poll, args.requests)
+        set_cookie = sum(1 for r in responses if 'Set-Cookie' in r.headers)
+        header_bytes = statistics.mean(
+            sum(len(k) + len(v) + 4 for k, v in r.headers.items()) for r in responses
+        )
+        body_bytes = statistics.mean(len(r.data) for r in responses)
+        print(f"{label:28} mean {statistics.mean(times):6.2f} ms  "
+              f"p95 {sorted(times)[int(len(times) * 0.95) - 1]:6.2f} ms  "
+              f"headers {header_bytes:6.0f} B  body {body_bytes:5.0f} B  "
+              f"Set-Cookie on {set_cookie}/{len(responses)}")
+
+
+# ------------------------------
+# Static Assets
+# ------------------------------
+def bench_assets(args):
+    """Bytes transferred per admin dashboard view, inline vs fingerprinted assets."""
+    import re
+
+    app = scratch_app()
+    _seed_admin(app, polls=args.polls)
+    client = app.test_client()
+    _login(client)
+
+    html = client.get('/admin/dashboard').data
+    urls = re.findall(rb'(?:href|src)="(/assets/[^"]+)"', html)
+
+    raw = compressed = 0
+    for url in urls:
+        raw += len(client.get(url.decode(), headers={'Accept-Encoding': 'identity'}).data)
+        response = client.get(url.decode(), headers={'Accept-Encoding': 'gzip, zstd'})
+        compressed += len(response.data)
+        print(f"  {url.decode():45} {response.headers.get('Content-Encoding', 'identity'):5} "
+              f"{response.headers['Cache-Control']}")
+
+    print(f"inline CSS/JS (before), every view   {len(html) + raw:8} B")
+    print(f"fingerprinted, first view            {len(html) + compressed:8} B")
+    print(f"fingerprinted, cached repeat view    {len(html):8} B")
+
+
+# ------------------------------
+# Bulk Poll Import
+# ------------------------------
+def bench_import(args):
+    """Create N polls x M candidates: per-poll ORM commits vs one bulk transaction."""
+    from models import db, Poll, Candidate
+    from poll_import import import_polls
+
+    app = scratch_app()
+    now = datetime.utcnow()
+    definitions = [
+        {
+            'title': f'Election poll {i}',
+            'start_time': now,
+            'end_time': now + timedelta(hours=10),
+            'candidates': [f'Candidate {i}-{j}' for j in range(args.candidates)],
+        }
+        for i in range(args.polls)
+    ]
+
+    with app.app_context():
+        start = time.perf_counter()
+        # What add_poll_with_candidates used to do, once per poll
+        for item in definitions:
+            poll = Poll(title=item['title'], start_time=item['start_time'],
+                        end_time=item['end_time'], is_active=True)
+            db.session.add(poll)
+            db.session.commit()
+            for name in item['candidates']:
+                db.session.add(Candidate(name=name, poll_id=poll.id))
+            db.session.commit()
+        orm_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        import_polls(definitions, dry_run=True)
+        dry_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        summary = import_polls(definitions)
+        bulk_seconds = time.perf_counter() - start
+
+    print(f"{args.polls} polls x {args.candidates} candidates ({summary['candidates']} rows)")
+    print(f"  per-poll ORM commits   {orm_seconds:7.2f} s")
+    print(f"  bulk import (dry run)  {dry_seconds:7.2f} s")
+    print(f"  bulk import            {bulk_seconds:7.2f} s")
+
+
+# ------------------------------
+# Poll Deletes
+# ------------------------------
+def bench_delete(args):
+    """Delete a poll with N votes: ORM cascade vs set-based DELETEs."""
+    from sqlalchemy import insert
+    from models import db, Poll, Vote
+    from bulk_delete import delete_poll
+
+    app = scratch_app()
+    poll_ids = _seed_admin(app, polls=3, candidates=4)
+
+    with app.app_context():
+        for poll_id in poll_ids:
+            candidates = [c.id for c in db.session.get(Poll, poll_id).candidates]
+            now = datetime.utcnow()
+            db.session.execute(insert(Vote), [
+                {'user_id': i + 2, 'candidate_id': candidates[i % len(candidates)],
+                 'poll_id': poll_id, 'timestamp': now}
+                for i in range(args.votes)
+            ])
+        db.session.commit()
+
+        start = time.perf_counter()
+        db.session.delete(db.session.get(Poll, poll_ids[0]))
+        db.session.commit()
+        orm_seconds = time.perf_counter() - start
+        db.session.remove()
+
+        start = time.perf_counter()
+        delete_poll(poll_ids[1])
+        bulk_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        delete_poll(poll_ids[2], chunk_size=args.chunk)
+        chunk_seconds = time.perf_counter() - start
+
+        remaining = db.session.query(Vote).count()
+
+    print(f"poll with {args.votes} votes")
+    print(f"  db.session.delete (ORM cascade)  {orm_seconds:7.2f} s")
+    print(f"  set-based DELETE                 {bulk_seconds:7.2f} s")
+    print(f"  {f'set-based, {args.chunk}-row chunks':33}{chunk_seconds:7.2f} s")
+    print(f"  votes left afterwards: {remaining}")
+
+
+# ------------------------------
+# Vote Ledger
+# ------------------------------
+def bench_ledger(args):
+    """Ledger verification of one large poll: full (1 core / all cores) vs incremental."""
+    from sqlalchemy import insert
+    from models import db, Poll, Vote
+    import ledger
+
+    app = scratch_app()
+    poll_id = _seed_admin(app, candidates=4)[0]
+
+    with app.app_context():
+        candidates = [c.id for c in db.session.get(Poll, poll_id).candidates]
+        now = datetime.utcnow()
+        db.session.execute(insert(Vote), [
+            {'user_id': i + 2, 'candidate_id': candidates[i % len(candidates)],
+             'poll_id': poll_id, 'timestamp': now}
+            for i in range(args.votes)
+        ])
+        db.session.commit()
+
+        start = time.perf_counter()
+        ledger.backfill()
+        print(f"poll with {args.votes} votes, chained in {time.perf_counter() - start:.2f} s")
+
+        for label, kwargs in (
+            ('full, 1 process', {'full': True, 'workers': 1}),
+            (f'full, {args.workers} processes', {'full': True, 'workers': args.workers}),
+            ('incremental (after a full run)', {'workers': args.workers}),
+        ):
+            report = ledger.verify(poll_id=poll_id, **kwargs)
+            print(f"  {label:32} {report['seconds']:7.2f} s  ok={report['ok']}")
+
+
+BENCHMARKS = {
+    'sessions': (bench_sessions, [
+        (('--requests',), {'type': int, 'default': 500}),
+    ]),
+    'assets': (bench_assets, [
+        (('--polls',), {'type': int, 'default': 10}),
+    ]),
+    'import': (bench_import, [
+        (('--polls',), {'type': int, 'default': 1000}),
+        (('--candidates',), {'type': int, 'default': 20}),
+    ]),
+    'delete': (bench_delete, [
+        (('--votes',), {'type': int, 'default': 200000}),
+        (('--chunk',), {'type': int, 'default': 50000}),
+    ]),
+    'ledger': (bench_ledger, [
+        (('--votes',), {'type': int, 'default': 200000}),
+        (('--workers',), {'type': int, 'default': os.cpu_count() or 1}),
+    ]),
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+    for name, (fn, options) in BENCHMARKS.items():
+        sub = subparsers.add_parser(name, help=fn.__doc__)
+        for flags, kwargs in options:
+            sub.add_argument(*flags, **kwargs)
+        sub.set_defaults(fn=fn)
+    args = parser.parse_args()
+    args.fn(args)
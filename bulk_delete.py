@@ -0,0 +1,190 @@
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import delete, func, select
+
+import ledger
+from models import db, Poll, User, Candidate, Vote, LedgerEntry, LedgerCheckpoint, PollArchive, ArchivedTally
+
+
+# ------------------------------
+# Set-Based Deletes
+# ------------------------------
+# db.session.delete(poll) walks the ORM cascades and loads every child vote
+# before deleting them one row at a time. These helpers issue plain DELETE
+# statements instead, so the number of votes only affects how long SQLite
+# spends in the statement, not how many objects Python has to build.
+DEFAULT_CHUNK = 50000
+# Nothing deleted here is expected to be live in the session, so skip the
+# ORM's "fetch" synchronisation (which would RETURNING every deleted id).
+NO_SYNC = {'synchronize_session': False}
+
+
+def _delete_votes_in_chunks(condition, chunk_size, progress):
+    """Delete matching votes ``chunk_size`` rows at a time, committing each chunk.
+
+    Committing between chunks releases SQLite's write lock so votes in other
+    polls are not blocked for the whole delete.
+    """
+    deleted = 0
+    while True:
+        ids = select(Vote.id).where(condition).limit(chunk_size).scalar_subquery()
+        count = db.session.execute(delete(Vote).where(Vote.id.in_(ids)), execution_options=NO_SYNC).rowcount
+        db.session.commit()
+        deleted += count
+        progress(deleted)
+        if count < chunk_size:
+            return deleted
+
+
+def delete_poll(poll_id, chunk_size=None, progress=None):
+    """Delete a poll, its candidates and its votes.
+
+    Without ``chunk_size`` everything happens in one transaction. With it,
+    voting on the poll is closed first and the votes are removed in committed
+    chunks, reporting the running total to ``progress``.
+    Returns the number of votes deleted.
+    """
+    progress = progress or (lambda deleted: None)
+    try:
+        if chunk_size:
+            db.session.execute(
+                Poll.__table__.update()
+                .where(Poll.id == poll_id)
+                .values(is_active=False, end_time=func.min(Poll.end_time, datetime.utcnow()))
+            )
+            db.session.commit()
+            votes = _delete_votes_in_chunks(Vote.poll_id == poll_id, chunk_size, progress)
+        else:
+            votes = db.session.execute(delete(Vote).where(Vote.poll_id == poll_id), execution_options=NO_SYNC).rowcount
+            progress(votes)
+        # The poll's ledger chain goes with it; there is nothing left to verify
+        db.session.execute(delete(LedgerEntry).where(LedgerEntry.poll_id == poll_id), execution_options=NO_SYNC)
+        db.session.execute(delete(LedgerCheckpoint).where(LedgerCheckpoint.poll_id == poll_id), execution_options=NO_SYNC)
+        db.session.execute(delete(ArchivedTally).where(ArchivedTally.poll_id == poll_id), execution_options=NO_SYNC)
+        db.session.execute(delete(PollArchive).where(PollArchive.poll_id == poll_id), execution_options=NO_SYNC)
+        db.session.execute(delete(Candidate).where(Candidate.poll_id == poll_id), execution_options=NO_SYNC)
+        db.session.execute(delete(Poll).where(Poll.id == poll_id))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return votes
+
+
+def _delete_user_votes(user_id, limit=None):
+    """Delete (up to ``limit`` of) a user's votes and chain a tombstone for each."""
+    query = (
+        db.session.query(Vote.id, Vote.user_id, Vote.candidate_id, Vote.poll_id)
+        .filter(Vote.user_id == user_id)
+        .order_by(Vote.id)
+    )
+    votes = query.limit(limit).all() if limit else query.all()
+    if votes:
+        db.session.execute(
+            delete(Vote).where(Vote.user_id == user_id, Vote.id <= votes[-1][0]),
+            execution_options=NO_SYNC,
+        )
+        ledger.record_deletions(votes)
+    return len(votes)
+
+
+def delete_user(user_id, chunk_size=None, progress=None):
+    """Delete a user and their votes with set-based DELETEs.
+
+    Their ledger entries stay; each removed vote gets a tombstone entry in
+    its poll's chain, so verification can tell this apart from tampering.
+    """
+    progress = progress or (lambda deleted: None)
+    try:
+        if chunk_size:
+            votes = 0
+            while True:
+                count = _delete_user_votes(user_id, chunk_size)
+                db.session.commit()
+                votes += count
+                progress(votes)
+                if count < chunk_size:
+                    break
+        else:
+            votes = _delete_user_votes(user_id)
+            progress(votes)
+        db.session.execute(delete(User).where(User.id == user_id))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return votes
+
+
+# ------------------------------
+# Background Jobs
+# ------------------------------
+class DeleteJobs:
+    """Runs large deletes on a background thread and tracks their progress.
+
+    Job state lives in this process only; with several workers, poll the
+    status endpoint on a sticky session or expect a 404 from other workers.
+    """
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def start(self, app, kind, target_id, on_done=None, chunk_size=DEFAULT_CHUNK):
+        """Start deleting a 'poll' or 'user'; returns the job id."""
+        fn = {'poll': delete_poll, 'user': delete_user}[kind]
+
+        with app.app_context():
+            total = db.session.scalar(
+                select(func.count(Vote.id)).where(
+                    (Vote.poll_id if kind == 'poll' else Vote.user_id) == target_id
+                )
+            )
+            db.session.remove()
+
+        job_id = uuid.uuid4().hex
+        job = {
+            'id': job_id,
+            'kind': kind,
+            'target_id': target_id,
+            'status': 'running',
+            'votes_total': total,
+            'votes_deleted': 0,
+            'started': time.time(),
+            'finished': None,
+            'error': None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+
+        def progress(deleted):
+            job['votes_deleted'] = deleted
+
+        def run():
+            with app.app_context():
+                try:
+                    fn(target_id, chunk_size=chunk_size, progress=progress)
+                    if on_done:
+                        on_done(target_id)
+                    job['status'] = 'done'
+                except Exception as e:
+                    job['status'] = 'failed'
+                    job['error'] = str(e)
+                    print(f"Delete job {job_id} failed: {e}")
+                finally:
+                    job['finished'] = time.time()
+                    db.session.remove()
+
+        threading.Thread(target=run, name=f'delete-{kind}-{target_id}', daemon=True).start()
+        return job_id
+
+    def status(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+
+delete_jobs = DeleteJobs()
@@ -0,0 +1,120 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy.orm import selectinload
+
+from models import db, Poll, Vote, candidate_vote_counts
+
+
+# ------------------------------
+# View Models
+# ------------------------------
+# Plain, immutable snapshots of what the dashboard templates read. Nothing in
+# here is bound to the session, so rendering can never trigger a lazy load.
+@dataclass(frozen=True, slots=True)
+class CandidateView:
+    id: int
+    name: str
+
+
+@dataclass(frozen=True, slots=True)
+class PollView:
+    id: int
+    title: str
+    start_time: datetime
+    end_time: datetime
+    is_active: bool
+    candidates: tuple
+
+
+@dataclass(frozen=True, slots=True)
+class WinnerView:
+    name: str
+    votes: int
+
+
+@dataclass(frozen=True, slots=True)
+class ExpiredPollView:
+    poll: PollView
+    winner: WinnerView
+
+
+@dataclass(frozen=True, slots=True)
+class UserDashboard:
+    active_polls: tuple
+    expired_with_winners: tuple
+    user_votes: dict
+    user_voted_poll_ids: frozenset
+
+
+# ------------------------------
+# Loader
+# ------------------------------
+def _poll_view(poll):
+    return PollView(
+        id=poll.id,
+        title=poll.title,
+        start_time=poll.start_time,
+        end_time=poll.end_time,
+        is_active=poll.is_active,
+        candidates=tuple(CandidateView(id=c.id, name=c.name) for c in poll.candidates),
+    )
+
+
+def _winners(expired_polls):
+    """Pick each expired poll's top candidate from one set of grouped counts."""
+    if not expired_polls:
+        return {}
+
+    counts = candidate_vote_counts([poll.id for poll in expired_polls])
+
+    winners = {}
+    for poll in expired_polls:
+        best = None
+        for candidate in poll.candidates:
+            votes = counts.get(candidate.id, 0)
+            if votes > 0 and (best is None or votes > best.votes):
+                best = WinnerView(name=candidate.name, votes=votes)
+        winners[poll.id] = best
+    return winners
+
+
+def load_user_dashboard(user_id, now=None):
+    """Load everything user_dashboard.html needs in a fixed number of queries.
+
+    Polls + candidates (selectinload), the user's votes and the live and
+    archived vote counts for expired polls: five queries regardless of how
+    many polls exist.
+    """
+    now = now or datetime.utcnow()
+
+    polls = (
+        Poll.query
+        .options(selectinload(Poll.candidates))
+        .order_by(Poll.start_time.desc())
+        .all()
+    )
+    active = [poll for poll in polls if poll.end_time >= now]
+    expired = sorted(
+        (poll for poll in polls if poll.end_time < now),
+        key=lambda poll: poll.end_time,
+        reverse=True,
+    )
+
+    user_votes = dict(
+        db.session.query(Vote.poll_id, Vote.candidate_id)
+        .filter(Vote.user_id == user_id)
+        .all()
+    )
+
+    winners = _winners(expired)
+
+    return UserDashboard(
+        active_polls=tuple(_poll_view(poll) for poll in active),
+        expired_with_winners=tuple(
+            ExpiredPollView(poll=_poll_view(poll), winner=winners[poll.id])
+            for poll in expired
+        ),
+        user_votes=user_votes,
+        user_voted_poll_ids=frozenset(user_votes),
+    )
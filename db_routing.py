@@ -0,0 +1,237 @@
+import fcntl
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, g, has_app_context, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import SQLAlchemyError
+
+
+# ------------------------------
+# Routing Session
+# ------------------------------
+class RoutingSession(Session):
+    """Sends reads to the read replica while a request is marked read-only.
+
+    Flushes always go to the primary, so objects loaded from the replica can
+    still be modified and committed as usual.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context() and g.get('read_replica'):
+            replica = current_app.extensions.get('read_replica')
+            engine = replica.engine_for_read() if replica else None
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def reading():
+    """Route the reads inside this block to the replica (when it is fresh enough)."""
+    previous = g.get('read_replica', False)
+    g.read_replica = True
+    try:
+        yield
+    finally:
+        g.read_replica = previous
+
+
+def read_only(f):
+    """View decorator: this endpoint only reads, so it may use the replica."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        with reading():
+            return f(*args, **kwargs)
+    return decorated_function
+
+
+# ------------------------------
+# Read Replica
+# ------------------------------
+HEARTBEAT_DDL = 'CREATE TABLE IF NOT EXISTS replica_heartbeat (id INTEGER PRIMARY KEY, beat FLOAT NOT NULL)'
+
+
+class ReadReplica:
+    """A read-only copy of the primary database for results traffic.
+
+    With READ_REPLICA_URI set, reads go to that database. Every worker writes
+    the current time into a heartbeat row on the primary and reads it back
+    from the replica, so the replica's lag is known.
+
+    Otherwise one snapshot of the SQLite primary per host is refreshed with
+    the SQLite backup API; this stands in for a real replica. The primary is
+    switched to WAL mode so taking the snapshot never blocks vote commits.
+    Whichever worker holds the snapshot lock refreshes it; the others pick up
+    the new file, whose mtime records when it was taken.
+
+    Either way, reads fall back to the primary when the replica is older than
+    READ_REPLICA_MAX_STALENESS seconds, or when the current client has
+    written something (POST/PUT/PATCH/DELETE) since the replica's data was
+    taken, so users always see their own vote.
+
+    Config:
+        READ_REPLICA_URI                use an existing replica instead of snapshots
+        READ_REPLICA_PATH               snapshot file (default <instance>/replica/voting.db)
+        READ_REPLICA_MAX_STALENESS      seconds (default 15)
+        READ_REPLICA_REFRESH_INTERVAL   seconds between snapshots / heartbeats (default 5)
+    """
+
+    WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+    def __init__(self, app=None, db=None):
+        self.engine = None
+        self.primary = None
+        self.path = None
+        self.taken_at = 0.0
+        self.max_staleness = 15.0
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        app.config.setdefault('READ_REPLICA_URI', None)
+        app.config.setdefault('READ_REPLICA_PATH', os.path.join(app.instance_path, 'replica', 'voting.db'))
+        app.config.setdefault('READ_REPLICA_MAX_STALENESS', 15)
+        app.config.setdefault('READ_REPLICA_REFRESH_INTERVAL', 5)
+        self.max_staleness = float(app.config['READ_REPLICA_MAX_STALENESS'])
+        interval = float(app.config['READ_REPLICA_REFRESH_INTERVAL'])
+        app.extensions['read_replica'] = self
+        app.after_request(self._note_write)
+
+        with app.app_context():
+            self.primary = db.engine
+
+        if app.config['READ_REPLICA_URI']:
+            self.engine = create_engine(app.config['READ_REPLICA_URI'])
+            with self.primary.begin() as conn:
+                conn.exec_driver_sql(HEARTBEAT_DDL)
+            self._start(self._heartbeat_loop, interval)
+            return
+
+        if self.primary.dialect.name != 'sqlite' or not self.primary.url.database \
+                or self.primary.url.database == ':memory:':
+            return  # nothing to snapshot; every read stays on the primary
+
+        # Readers no longer block writers (and vice versa) while the backup runs
+        with self.primary.connect() as conn:
+            conn.exec_driver_sql('PRAGMA journal_mode=WAL')
+
+        self.path = app.config['READ_REPLICA_PATH']
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.engine = create_engine(f'sqlite:///{self.path}')
+        self._follow_snapshot()
+        self._start(self._snapshot_loop, interval)
+
+    def _start(self, loop, interval):
+        threading.Thread(target=loop, args=(interval,), name='read-replica-refresh', daemon=True).start()
+
+    # --------------------------
+    # External replica
+    # --------------------------
+    def heartbeat(self):
+        """Write a heartbeat to the primary, then see how far the replica has got."""
+        now = time.time()
+        with self.primary.begin() as conn:
+            updated = conn.execute(text('UPDATE replica_heartbeat SET beat = :beat WHERE id = 1'), {'beat': now})
+            if not updated.rowcount:
+                conn.execute(text('INSERT INTO replica_heartbeat (id, beat) VALUES (1, :beat)'), {'beat': now})
+        with self.engine.connect() as conn:
+            beat = conn.execute(text('SELECT beat FROM replica_heartbeat WHERE id = 1')).scalar()
+        # The replica holds everything the primary had when this beat was written
+        self.taken_at = beat or 0.0
+
+    def _heartbeat_loop(self, interval):
+        while True:
+            try:
+                self.heartbeat()
+            except SQLAlchemyError as e:
+                self.taken_at = 0.0  # unknown lag: read from the primary
+                print(f"Read replica heartbeat failed: {e}")
+            time.sleep(interval)
+
+    # --------------------------
+    # Local snapshot
+    # --------------------------
+    def refresh(self):
+        """Copy the primary into a fresh snapshot and switch reads over to it."""
+        started = time.time()
+        tmp = f'{self.path}.{os.getpid()}.tmp'
+        source = self.primary.raw_connection()
+        try:
+            target = sqlite3.connect(tmp)
+            try:
+                source.driver_connection.backup(target)
+                # A rollback-journal copy can be swapped with os.replace(); a WAL one can't
+                target.execute('PRAGMA journal_mode=DELETE')
+            finally:
+                target.close()
+        finally:
+            source.close()
+        os.utime(tmp, (started, started))
+        os.replace(tmp, self.path)
+        self._follow_snapshot()
+
+    def _snapshot_age(self):
+        try:
+            return time.time() - os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return float('inf')
+
+    def _follow_snapshot(self):
+        """Switch to the newest snapshot on disk, whoever took it."""
+        try:
+            taken_at = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return
+        if taken_at != self.taken_at:
+            # Connections still reading the old file finish there; new ones open the new copy
+            self.engine.dispose()
+            self.taken_at = taken_at
+
+    def _snapshot_loop(self, interval):
+        with open(f'{self.path}.lock', 'a') as lock:
+            while True:
+                try:
+                    if self._snapshot_age() >= interval:
+                        self._refresh_if_due(lock, interval)
+                    self._follow_snapshot()
+                except (sqlite3.Error, OSError) as e:
+                    print(f"Read replica refresh failed: {e}")
+                time.sleep(min(interval, 1.0))
+
+    def _refresh_if_due(self, lock, interval):
+        try:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return  # another worker on this host is taking the snapshot
+        try:
+            if self._snapshot_age() >= interval:
+                self.refresh()
+        finally:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    # --------------------------
+    # Routing
+    # --------------------------
+    def engine_for_read(self):
+        """The replica engine, or None when the read must go to the primary."""
+        if self.engine is None:
+            return None
+        if time.time() - self.taken_at > self.max_staleness:
+            return None
+        if has_request_context() and session.get('_last_write', 0) >= self.taken_at:
+            return None
+        return self.engine
+
+    def _note_write(self, response):
+        if request.method in self.WRITE_METHODS and response.status_code < 400:
+            session['_last_write'] = time.time()
+        return response
+
+
+read_replica = ReadReplica()
@@ -0,0 +1,13 @@
+import os
+
+
+def write_atomic(path, data):
+    """Write ``data`` to ``path`` via a temp file, so readers never see a partial file.
+
+    The temp file is per process, so concurrent writers of the same path
+    don't clobber each other; the last os.replace() wins.
+    """
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
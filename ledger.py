@@ -0,0 +1,402 @@
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import xxhash
+from sqlalchemy import and_, func, insert, select
+
+from models import db, Vote, LedgerEntry, LedgerCheckpoint, PollArchive
+
+
+# ------------------------------
+# Tamper-Evident Vote Ledger
+# ------------------------------
+# Every vote is mirrored into vote_ledger with a SHA-256 hash chained to the
+# previous entry of the same poll. Each CHECKPOINT_SIZE entries are sealed into
+# a checkpoint holding the Merkle root of the block's entry hashes, the last
+# chain hash, and an xxh64 digest of the matching rows in the vote table.
+#
+# Verification works block by block, so blocks can be checked in parallel.
+# Already verified blocks are only re-checked against their vote digest (one
+# xxhash pass) unless a full verification is requested. Publishing checkpoint
+# roots outside the database makes rewriting the whole chain detectable too.
+#
+# Votes removed by an admin (e.g. when a user is deleted) are not erased from
+# the chain: a DELETED tombstone entry is appended for each of them, and from
+# then on the vote's original entry is expected to have no vote row.
+#
+# Archiving a poll moves its entries into the archive file next to its votes;
+# verify() hands archived polls to VoteArchive.check().
+GENESIS = '0' * 64
+CHECKPOINT_SIZE = 1024
+VOTE = 'vote'
+DELETED = 'deleted'
+
+
+def payload(vote_id, user_id, candidate_id, poll_id, timestamp):
+    """Canonical bytes for one ballot."""
+    stamp = timestamp.isoformat() if timestamp else ''
+    return f'{vote_id}|{user_id}|{candidate_id}|{poll_id}|{stamp}'.encode()
+
+
+def entry_payload(kind, vote_id, user_id, candidate_id, poll_id, timestamp):
+    """Canonical bytes for one ledger entry; tombstones are prefixed with their kind."""
+    data = payload(vote_id, user_id, candidate_id, poll_id, timestamp)
+    return data if kind == VOTE else kind.encode() + b'|' + data
+
+
+def chain_hash(prev_hash, data):
+    return hashlib.sha256(prev_hash.encode() + data).hexdigest()
+
+
+def merkle_root(hashes):
+    level = [bytes.fromhex(h) for h in hashes] or [bytes(32)]
+    while len(level) > 1:
+        if len(level) % 2:
+            level.append(level[-1])
+        level = [hashlib.sha256(level[i] + level[i + 1]).digest() for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def chain_head(poll_id, entries):
+    """Last hash of a chain rebuilt from (kind, vote_id, user_id, candidate_id, timestamp) entries."""
+    prev = GENESIS
+    for kind, vote_id, user_id, candidate_id, timestamp in entries:
+        prev = chain_hash(prev, entry_payload(kind, vote_id, user_id, candidate_id, poll_id, timestamp))
+    return prev
+
+
+def live_votes(entries):
+    """Votes a chain says should exist: vote id -> (user_id, candidate_id, timestamp)."""
+    votes = {}
+    for kind, vote_id, user_id, candidate_id, timestamp in entries:
+        if kind == VOTE:
+            votes[vote_id] = (user_id, candidate_id, timestamp)
+        else:
+            votes.pop(vote_id, None)
+    return votes
+
+
+def vote_digest(payloads):
+    digest = xxhash.xxh64()
+    for data in payloads:
+        digest.update(data)
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+# ------------------------------
+# Appending
+# ------------------------------
+def _block_rows(poll_id, first_seq, last_seq):
+    """Ledger entries in a seq range joined with the current vote rows.
+
+    Row layout: seq, vote_id, user_id, candidate_id, timestamp, prev_hash,
+    entry_hash (0-6), the joined vote's id, user_id, candidate_id, poll_id,
+    timestamp (7-11) and the entry kind (12).
+    """
+    return (
+        db.session.query(
+            LedgerEntry.seq, LedgerEntry.vote_id, LedgerEntry.user_id,
+            LedgerEntry.candidate_id, LedgerEntry.timestamp,
+            LedgerEntry.prev_hash, LedgerEntry.entry_hash,
+            Vote.id, Vote.user_id, Vote.candidate_id, Vote.poll_id, Vote.timestamp,
+            LedgerEntry.kind,
+        )
+        .outerjoin(Vote, and_(Vote.id == LedgerEntry.vote_id, LedgerEntry.kind == VOTE))
+        .filter(LedgerEntry.poll_id == poll_id, LedgerEntry.seq.between(first_seq, last_seq))
+        .order_by(LedgerEntry.seq)
+        .all()
+    )
+
+
+def _deleted_seqs(poll_id):
+    """Seqs of vote entries whose vote a later tombstone records as removed."""
+    tombstoned = select(LedgerEntry.vote_id).where(LedgerEntry.poll_id == poll_id, LedgerEntry.kind == DELETED)
+    rows = (
+        db.session.query(LedgerEntry.seq, LedgerEntry.vote_id, LedgerEntry.kind)
+        .filter(LedgerEntry.poll_id == poll_id, LedgerEntry.vote_id.in_(tombstoned))
+        .order_by(LedgerEntry.seq)
+    )
+    latest = {}
+    deleted = set()
+    for seq, vote_id, kind in rows:
+        if kind == VOTE:
+            latest[vote_id] = seq
+        elif vote_id in latest:
+            deleted.add(latest.pop(vote_id))
+    return deleted
+
+
+def _vote_payload(row, deleted):
+    # A removed vote's id may since have been reused by SQLite, so its row is
+    # never looked at again
+    if row[7] is None or row[0] in deleted:
+        return b'missing'
+    return payload(*row[7:12])
+
+
+def _block_digest(rows, deleted):
+    return vote_digest(_vote_payload(row, deleted) for row in rows)
+
+
+def _seal(poll_id, first_seq, last_seq):
+    rows = _block_rows(poll_id, first_seq, last_seq)
+    db.session.add(LedgerCheckpoint(
+        poll_id=poll_id,
+        first_seq=first_seq,
+        last_seq=last_seq,
+        merkle_root=merkle_root([row[6] for row in rows]),
+        last_hash=rows[-1][6],
+        vote_digest=_block_digest(rows, _deleted_seqs(poll_id)),
+    ))
+
+
+def _append(poll_id, votes, kind=VOTE):
+    """Chain ``votes`` ((id, user_id, candidate_id, timestamp) tuples) onto a poll."""
+    last = (
+        db.session.query(LedgerEntry.seq, LedgerEntry.entry_hash)
+        .filter(LedgerEntry.poll_id == poll_id)
+        .order_by(LedgerEntry.seq.desc())
+        .first()
+    )
+    seq, prev = last if last else (0, GENESIS)
+
+    entries = []
+    for vote_id, user_id, candidate_id, timestamp in votes:
+        seq += 1
+        entry_hash = chain_hash(prev, entry_payload(kind, vote_id, user_id, candidate_id, poll_id, timestamp))
+        entries.append({
+            'poll_id': poll_id, 'seq': seq, 'kind': kind, 'vote_id': vote_id, 'user_id': user_id,
+            'candidate_id': candidate_id, 'timestamp': timestamp,
+            'prev_hash': prev, 'entry_hash': entry_hash,
+        })
+        prev = entry_hash
+    if not entries:
+        return 0
+
+    db.session.execute(insert(LedgerEntry), entries)
+    first_new = entries[0]['seq']
+    for boundary in range(first_new + (-first_new % CHECKPOINT_SIZE), seq + 1, CHECKPOINT_SIZE):
+        _seal(poll_id, boundary - CHECKPOINT_SIZE + 1, boundary)
+    return len(entries)
+
+
+def append_vote(vote):
+    """Add a freshly flushed vote to its poll's chain (same transaction)."""
+    if vote.id is None:
+        db.session.flush()
+    _append(int(vote.poll_id), [(vote.id, int(vote.user_id), int(vote.candidate_id), vote.timestamp)])
+
+
+def record_deletions(votes):
+    """Chain a tombstone for each removed vote ((id, user_id, candidate_id, poll_id) tuples).
+
+    Call after the vote rows are deleted, in the same transaction. Sealed
+    blocks holding the removed votes get their vote digest recomputed, since
+    those votes are now expected to be missing.
+    """
+    removed_at = datetime.utcnow()
+    by_poll = {}
+    for vote_id, user_id, candidate_id, poll_id in votes:
+        by_poll.setdefault(int(poll_id), []).append((vote_id, int(user_id), int(candidate_id), removed_at))
+
+    for poll_id, removed in by_poll.items():
+        _append(poll_id, removed, kind=DELETED)
+        seqs = [
+            seq for (seq,) in
+            db.session.query(LedgerEntry.seq).filter(
+                LedgerEntry.poll_id == poll_id,
+                LedgerEntry.kind == VOTE,
+                LedgerEntry.vote_id.in_([vote_id for vote_id, *_ in removed]),
+            )
+        ]
+        if not seqs:
+            continue
+        deleted = _deleted_seqs(poll_id)
+        checkpoints = LedgerCheckpoint.query.filter(
+            LedgerCheckpoint.poll_id == poll_id,
+            LedgerCheckpoint.first_seq <= max(seqs),
+            LedgerCheckpoint.last_seq >= min(seqs),
+        )
+        for cp in checkpoints:
+            if any(cp.first_seq <= seq <= cp.last_seq for seq in seqs):
+                cp.vote_digest = _block_digest(_block_rows(poll_id, cp.first_seq, cp.last_seq), deleted)
+
+
+def backfill():
+    """Chain every vote that isn't in the ledger yet (e.g. votes cast before it existed)."""
+    ledgered = select(LedgerEntry.vote_id).where(LedgerEntry.kind == VOTE)
+    poll_ids = [
+        poll_id for (poll_id,) in
+        db.session.query(Vote.poll_id).filter(Vote.id.not_in(ledgered)).distinct()
+    ]
+    added = 0
+    for poll_id in poll_ids:
+        votes = (
+            db.session.query(Vote.id, Vote.user_id, Vote.candidate_id, Vote.timestamp)
+            .filter(Vote.poll_id == poll_id, Vote.id.not_in(ledgered))
+            .order_by(Vote.id)
+            .all()
+        )
+        added += _append(poll_id, votes)
+        db.session.commit()
+    return added
+
+
+# ------------------------------
+# Verification
+# ------------------------------
+def _expected_payload(row, poll_id, deleted):
+    """What the vote table should hold for an entry, according to the ledger."""
+    if row[12] != VOTE or row[0] in deleted:
+        return b'missing'
+    return payload(row[1], row[2], row[3], poll_id, row[4])
+
+
+def _check_block(task):
+    """Verify one block of entries. Runs in a worker process, so no DB access."""
+    label, poll_id, rows, expected_prev, checkpoint, full, deleted = task
+    if not rows:
+        return [f"{label}: ledger entries are missing"]
+    problems = []
+    if rows[0][5] != expected_prev:
+        problems.append(f"{label}: does not link to the previous block")
+
+    if full or checkpoint is None:
+        prev = expected_prev
+        for row in rows:
+            seq, vote_id, user_id, candidate_id, timestamp, prev_hash, entry_hash = row[:7]
+            if prev_hash != prev:
+                problems.append(f"{label}: entry {seq} breaks the chain")
+            data = entry_payload(row[12], vote_id, user_id, candidate_id, poll_id, timestamp)
+            if chain_hash(prev_hash, data) != entry_hash:
+                problems.append(f"{label}: entry {seq} (vote {vote_id}) was altered")
+            prev = entry_hash
+        if checkpoint is not None:
+            root, last_hash, _ = checkpoint
+            if merkle_root([row[6] for row in rows]) != root:
+                problems.append(f"{label}: Merkle root does not match the checkpoint")
+            if rows[-1][6] != last_hash:
+                problems.append(f"{label}: last hash does not match the checkpoint")
+
+    # Compare the live vote rows with what the ledger recorded; a matching
+    # digest clears the whole block without looking at individual rows
+    if checkpoint is not None and _block_digest(rows, deleted) == checkpoint[2]:
+        return problems
+    differing = [
+        row[1] for row in rows
+        if _vote_payload(row, deleted) != _expected_payload(row, poll_id, deleted)
+    ]
+    problems.extend(f"{label}: vote {vote_id} differs from the ledger" for vote_id in differing)
+    if checkpoint is not None and not differing:
+        # Votes and ledger entries were edited together
+        problems.append(f"{label}: vote rows do not match the checkpoint digest")
+    return problems
+
+
+def _tasks(poll_id, full):
+    checkpoints = (
+        LedgerCheckpoint.query.filter_by(poll_id=poll_id)
+        .order_by(LedgerCheckpoint.first_seq)
+        .all()
+    )
+    deleted = _deleted_seqs(poll_id)
+    prev = GENESIS
+    next_seq = 1
+    for cp in checkpoints:
+        if cp.first_seq != next_seq:
+            yield None, (f'poll {poll_id} seq {next_seq}-{cp.first_seq - 1}', poll_id, [], prev, None, True, frozenset())
+        rows = [tuple(row) for row in _block_rows(poll_id, cp.first_seq, cp.last_seq)]
+        block_deleted = frozenset(seq for seq in deleted if cp.first_seq <= seq <= cp.last_seq)
+        yield cp, (f'poll {poll_id} seq {cp.first_seq}-{cp.last_seq}', poll_id, rows, prev,
+                   (cp.merkle_root, cp.last_hash, cp.vote_digest), full or cp.verified_at is None, block_deleted)
+        prev = cp.last_hash
+        next_seq = cp.last_seq + 1
+
+    last_seq = db.session.query(func.max(LedgerEntry.seq)).filter_by(poll_id=poll_id).scalar() or 0
+    if last_seq >= next_seq:
+        rows = [tuple(row) for row in _block_rows(poll_id, next_seq, last_seq)]
+        block_deleted = frozenset(seq for seq in deleted if seq >= next_seq)
+        yield None, (f'poll {poll_id} seq {next_seq}-{last_seq} (unsealed)', poll_id, rows, prev, None, True, block_deleted)
+
+
+def verify(poll_id=None, full=False, workers=None):
+    """Check ledger chains and the vote table against each other.
+
+    Returns a report dict; ``report['ok']`` is False if anything was found.
+    Blocks are spread over ``workers`` processes (default: all cores).
+    Archived polls are checked against their archive file instead.
+    """
+    from archive import vote_archive  # archive imports this module
+
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+
+    archived = {p for (p,) in db.session.query(PollArchive.poll_id)}
+    if poll_id is None:
+        poll_ids = sorted(
+            {p for (p,) in db.session.query(LedgerEntry.poll_id).distinct()}
+            | {p for (p,) in db.session.query(Vote.poll_id).distinct()}
+            | archived
+        )
+    else:
+        poll_ids = [int(poll_id)]
+
+    report = {'ok': True, 'full': full, 'polls': {}}
+    pool = ProcessPoolExecutor(workers) if workers > 1 else None
+    try:
+        for pid in poll_ids:
+            if pid in archived:
+                problems = vote_archive.check(pid, full=full)
+                report['polls'][pid] = {'blocks': 0, 'archived': True, 'problems': problems}
+                report['ok'] = report['ok'] and not problems
+                continue
+
+            problems = []
+            passed = []
+            pending = []
+            blocks = 0
+
+            def collect(item):
+                cp, future = item
+                found = future.result() if pool else future
+                problems.extend(found)
+                if cp is not None and not found:
+                    passed.append(cp)
+
+            for cp, task in _tasks(pid, full):
+                blocks += 1
+                pending.append((cp, pool.submit(_check_block, task) if pool else _check_block(task)))
+                # Bound memory: don't queue more than a couple of blocks per worker
+                while len(pending) > workers * 2:
+                    collect(pending.pop(0))
+            for item in pending:
+                collect(item)
+
+            missing = (
+                db.session.query(Vote.id)
+                .filter(Vote.poll_id == pid,
+                        Vote.id.not_in(select(LedgerEntry.vote_id).where(LedgerEntry.poll_id == pid)))
+                .order_by(Vote.id)
+                .all()
+            )
+            if missing:
+                ids = ', '.join(str(v) for (v,) in missing[:20])
+                problems.append(f"poll {pid}: {len(missing)} vote(s) not in the ledger ({ids})")
+
+            now = datetime.utcnow()
+            for cp in passed:
+                cp.verified_at = now
+            db.session.commit()
+
+            report['polls'][pid] = {'blocks': blocks, 'archived': False, 'problems': problems}
+            report['ok'] = report['ok'] and not problems
+    finally:
+        if pool:
+            pool.shutdown()
+
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    return report
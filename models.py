@@ -1,8 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from datetime import datetime
+from db_routing import RoutingSession
 
-db = SQLAlchemy()
+# RoutingSession lets read-only endpoints use the read replica (db_routing.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 # ------------------------------
 # Poll Model
@@ -30,17 +32,10 @@ class Poll(db.Model):
 
     def get_winner(self):
         """Return the candidate with the highest votes for this poll."""
-        from sqlalchemy import func
-        winner = (
-            db.session.query(Candidate, func.count(Vote.id).label('vote_count'))
-            .join(Vote, Candidate.id == Vote.candidate_id, isouter=True)
-            .filter(Candidate.poll_id == self.id)
-            .group_by(Candidate.id)
-            .order_by(db.desc('vote_count'))
-            .first()
-        )
-        if winner and winner[1] > 0:
-            return {'name': winner[0].name, 'votes': winner[1]}
+        counts = candidate_vote_counts([self.id])
+        winner = max(self.candidates, key=lambda c: counts.get(c.id, 0), default=None)
+        if winner and counts.get(winner.id, 0) > 0:
+            return {'name': winner.name, 'votes': counts[winner.id]}
         return None
 
 
@@ -70,7 +65,7 @@ class Candidate(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False)
-    poll_id = db.Column(db.Integer, db.ForeignKey('poll.id', ondelete='CASCADE'), nullable=False)
+    poll_id = db.Column(db.Integer, db.ForeignKey('poll.id', ondelete='CASCADE'), nullable=False, index=True)
 
     # Relationship to votes
     votes = db.relationship('Vote', backref='candidate', lazy=True, cascade="all, delete")
@@ -80,16 +75,92 @@ class Candidate(db.Model):
 # ------------------------------
 class Vote(db.Model):
     __tablename__ = 'vote'
+    # One vote per user per poll. An index rather than a UniqueConstraint so
+    # create_missing_indexes() also adds it to existing databases.
+    __table_args__ = (db.Index('uq_vote_user_poll', 'user_id', 'poll_id', unique=True),)
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
-    candidate_id = db.Column(db.Integer, db.ForeignKey('candidate.id', ondelete='CASCADE'), nullable=False)
-    poll_id = db.Column(db.Integer, db.ForeignKey('poll.id', ondelete='CASCADE'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
+    candidate_id = db.Column(db.Integer, db.ForeignKey('candidate.id', ondelete='CASCADE'), nullable=False, index=True)
+    poll_id = db.Column(db.Integer, db.ForeignKey('poll.id', ondelete='CASCADE'), nullable=False, index=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
     # Relationship back to Poll
     poll = db.relationship('Poll', back_populates='votes')  # ✅ fixed — now matches Poll.votes
 
+# ------------------------------
+# Vote Ledger (append-only, hash-chained per poll)
+# ------------------------------
+class LedgerEntry(db.Model):
+    __tablename__ = 'vote_ledger'
+    __table_args__ = (db.UniqueConstraint('poll_id', 'seq'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    poll_id = db.Column(db.Integer, nullable=False, index=True)
+    seq = db.Column(db.Integer, nullable=False)  # 1, 2, 3... within the poll
+    kind = db.Column(db.String(10), nullable=False, default='vote', server_default='vote')  # 'vote' or 'deleted'
+    vote_id = db.Column(db.Integer, nullable=False, index=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    candidate_id = db.Column(db.Integer, nullable=False)
+    timestamp = db.Column(db.DateTime, nullable=False)
+    prev_hash = db.Column(db.String(64), nullable=False)
+    entry_hash = db.Column(db.String(64), nullable=False)
+
+
+class LedgerCheckpoint(db.Model):
+    __tablename__ = 'ledger_checkpoint'
+
+    id = db.Column(db.Integer, primary_key=True)
+    poll_id = db.Column(db.Integer, nullable=False, index=True)
+    first_seq = db.Column(db.Integer, nullable=False)
+    last_seq = db.Column(db.Integer, nullable=False)
+    merkle_root = db.Column(db.String(64), nullable=False)
+    last_hash = db.Column(db.String(64), nullable=False)
+    vote_digest = db.Column(db.String(16), nullable=False)  # xxh64 of the block's vote rows
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    verified_at = db.Column(db.DateTime)
+
+# ------------------------------
+# Archived Polls
+# ------------------------------
+# Votes of long-closed polls are moved out of the vote table into compressed
+# array files (see archive.py); the final tally stays here.
+class PollArchive(db.Model):
+    __tablename__ = 'poll_archive'
+
+    poll_id = db.Column(db.Integer, db.ForeignKey('poll.id', ondelete='CASCADE'), primary_key=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    vote_count = db.Column(db.Integer, nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    checksum = db.Column(db.String(16), nullable=False)  # xxh64 of the uncompressed arrays
+    ledger_head = db.Column(db.String(64))  # last chain hash when the poll was archived
+
+
+class ArchivedTally(db.Model):
+    __tablename__ = 'archived_tally'
+
+    poll_id = db.Column(db.Integer, db.ForeignKey('poll.id', ondelete='CASCADE'), primary_key=True)
+    candidate_id = db.Column(db.Integer, db.ForeignKey('candidate.id', ondelete='CASCADE'), primary_key=True)
+    votes = db.Column(db.Integer, nullable=False)
+
+
+def candidate_vote_counts(poll_ids=None):
+    """Vote count per candidate id, for live and archived polls alike.
+
+    Candidates without votes are left out; use ``counts.get(id, 0)``.
+    """
+    from sqlalchemy import func
+    live = db.session.query(Vote.candidate_id, func.count(Vote.id)).group_by(Vote.candidate_id)
+    archived = db.session.query(ArchivedTally.candidate_id, ArchivedTally.votes)
+    if poll_ids is not None:
+        live = live.filter(Vote.poll_id.in_(poll_ids))
+        archived = archived.filter(ArchivedTally.poll_id.in_(poll_ids))
+
+    counts = dict(live.all())
+    for candidate_id, votes in archived.all():
+        counts[candidate_id] = counts.get(candidate_id, 0) + votes
+    return counts
+
 # ------------------------------
 # Voting Session (Optional Global Control)
 # ------------------------------
@@ -100,6 +171,38 @@ class VotingSession(db.Model):
     is_active = db.Column(db.Boolean, default=False)
 
 
+def add_missing_columns():
+    """Add columns declared on the models to tables created before they existed.
+
+    Only columns that are nullable or have a server default can be added this
+    way (SQLite's ALTER TABLE ADD COLUMN restriction).
+    """
+    from sqlalchemy import inspect
+    from sqlalchemy.schema import CreateColumn
+
+    inspector = inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+                    conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {ddl}')
+
+
+def create_missing_indexes():
+    """Add indexes declared on the models to tables created before they existed.
+
+    ``db.create_all()`` only creates missing tables, so older databases would
+    otherwise never get the foreign key indexes.
+    """
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+
 def get_winner(self):
     """Return the candidate with the highest votes for this poll."""
     from sqlalchemy import func
@@ -0,0 +1,172 @@
+import json
+from datetime import datetime, timezone
+
+import yaml
+from sqlalchemy import insert
+
+from models import db, Poll, Candidate
+
+
+# ------------------------------
+# Bulk Poll Import
+# ------------------------------
+# Accepts JSON or YAML shaped like:
+#
+#   polls:
+#     - title: Class Representative
+#       start_time: 2026-11-03T08:00
+#       end_time: 2026-11-03T18:00
+#       candidates: [Alice, Bob]
+#
+# (a bare list of polls works too). Everything is validated before anything is
+# written, then all polls and candidates go in with executemany inserts inside
+# a single transaction.
+TIME_FORMATS = ('%Y-%m-%dT%H:%M', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S')
+TITLE_MAX = Poll.title.type.length
+NAME_MAX = Candidate.name.type.length
+
+
+class PollImportError(ValueError):
+    """Raised when a poll definition file fails validation."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f"{len(errors)} problem(s) in poll definitions: " + "; ".join(errors[:5]))
+
+
+def load_definitions(text, filename=''):
+    """Parse JSON or YAML text into a list of poll dicts."""
+    try:
+        if filename.endswith('.json'):
+            data = json.loads(text)
+        else:
+            # YAML is a superset of JSON, so this handles both
+            data = yaml.safe_load(text)
+    except (ValueError, yaml.YAMLError) as e:
+        raise PollImportError([f"could not parse file: {e}"])
+
+    if isinstance(data, dict):
+        data = data.get('polls')
+    if not isinstance(data, list):
+        raise PollImportError(["expected a list of polls or a mapping with a 'polls' list"])
+    return data
+
+
+def _parse_time(value):
+    if isinstance(value, datetime):
+        # Stored naive in UTC, like the rest of the app
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+    if isinstance(value, str):
+        for fmt in TIME_FORMATS:
+            try:
+                return datetime.strptime(value.strip(), fmt)
+            except ValueError:
+                pass
+    return None
+
+
+def validate(definitions):
+    """Check every definition up front.
+
+    Returns (poll_rows, candidate_names) ready for insertion, or raises
+    PollImportError listing every problem found.
+    """
+    errors = []
+    poll_rows = []
+    candidate_names = []
+
+    for i, item in enumerate(definitions, start=1):
+        where = f"poll #{i}"
+        if not isinstance(item, dict):
+            errors.append(f"{where}: expected a mapping")
+            continue
+
+        title = item.get('title')
+        if title is None:
+            title = ''
+        if not isinstance(title, str):
+            errors.append(f"{where}: title must be text, got {title!r}")
+        else:
+            title = title.strip()
+            if title:
+                where = f"poll #{i} ({title!r})"
+            if not title:
+                errors.append(f"{where}: title is required")
+            elif len(title) > TITLE_MAX:
+                errors.append(f"{where}: title is longer than {TITLE_MAX} characters")
+
+        start_time = _parse_time(item.get('start_time'))
+        end_time = _parse_time(item.get('end_time'))
+        if start_time is None:
+            errors.append(f"{where}: start_time is missing or not a date/time")
+        if end_time is None:
+            errors.append(f"{where}: end_time is missing or not a date/time")
+        if start_time and end_time and end_time <= start_time:
+            errors.append(f"{where}: end_time must be after start_time")
+
+        names = item.get('candidates') or []
+        if not isinstance(names, list):
+            errors.append(f"{where}: candidates must be a list of names")
+            names = []
+        bad = [name for name in names if not isinstance(name, str)]
+        if bad:
+            errors.append(f"{where}: candidate names must be text, got {', '.join(map(repr, bad))}")
+        names = [name.strip() for name in names if isinstance(name, str)]
+        if any(not name for name in names):
+            errors.append(f"{where}: candidate names cannot be blank")
+        if any(len(name) > NAME_MAX for name in names):
+            errors.append(f"{where}: candidate names are limited to {NAME_MAX} characters")
+        if len(set(names)) != len(names):
+            errors.append(f"{where}: duplicate candidate names")
+
+        is_active = item.get('is_active', True)
+        if not isinstance(is_active, bool):
+            errors.append(f"{where}: is_active must be true or false, got {is_active!r}")
+
+        poll_rows.append({
+            'title': title,
+            'start_time': start_time,
+            'end_time': end_time,
+            'is_active': is_active,
+        })
+        candidate_names.append(names)
+
+    if errors:
+        raise PollImportError(errors)
+    return poll_rows, candidate_names
+
+
+def import_polls(definitions, dry_run=False):
+    """Validate and create polls with their candidates in one transaction.
+
+    With ``dry_run`` nothing is written; the returned summary shows what
+    would have been created.
+    """
+    poll_rows, candidate_names = validate(definitions)
+    summary = {
+        'polls': len(poll_rows),
+        'candidates': sum(len(names) for names in candidate_names),
+        'dry_run': dry_run,
+    }
+    if dry_run or not poll_rows:
+        return summary
+
+    try:
+        poll_ids = db.session.scalars(
+            insert(Poll).returning(Poll.id, sort_by_parameter_order=True),
+            poll_rows,
+        ).all()
+        candidate_rows = [
+            {'name': name, 'poll_id': poll_id}
+            for poll_id, names in zip(poll_ids, candidate_names)
+            for name in names
+        ]
+        if candidate_rows:
+            db.session.execute(insert(Candidate), candidate_rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return summary
@@ -0,0 +1,267 @@
+import cProfile
+import fcntl
+import io
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from flask import g, has_app_context, request, before_render_template, template_rendered
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# ------------------------------
+# Request Profiling
+# ------------------------------
+# Opt-in per request (admins sending "X-Profile: 1", or "X-Profile: sampling")
+# or for a random PROFILING_SAMPLE_RATE fraction of all requests. Each captured
+# request stores a profile file plus one line in index.jsonl with the endpoint,
+# total time, SQL count/time, ORM objects loaded per model and template render
+# times, so slow endpoints can be broken down without guessing.
+#
+#   cprofile  -> <id>.prof    (pstats; open with snakeviz / flameprof)
+#   sampling  -> <id>.folded  (collapsed stacks; feed to flamegraph.pl / speedscope)
+PROFILE_ID = re.compile(r'^[\w-]+$')
+SKIP_ENDPOINTS = ('static', 'assets', 'favicon')
+
+
+class _StackSampler:
+    """Samples one thread's Python stack at a fixed interval."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    """Captures and stores profiles of selected requests.
+
+    Config:
+        PROFILING_SAMPLE_RATE      fraction of requests profiled at random (default 0)
+        PROFILING_HEADER           header admins send to profile a request (default X-Profile)
+        PROFILING_MODE             'cprofile' (default) or 'sampling' for sampled requests
+        PROFILING_SAMPLE_INTERVAL  seconds between stack samples (default 0.005)
+        PROFILING_DIR              defaults to <instance>/profiles
+        PROFILING_KEEP             newest profiles kept on disk (default 200)
+    """
+
+    def __init__(self, app=None, db=None):
+        self.directory = None
+        self.config = {}
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        app.config.setdefault('PROFILING_SAMPLE_RATE', 0.0)
+        app.config.setdefault('PROFILING_HEADER', 'X-Profile')
+        app.config.setdefault('PROFILING_MODE', 'cprofile')
+        app.config.setdefault('PROFILING_SAMPLE_INTERVAL', 0.005)
+        app.config.setdefault('PROFILING_DIR', os.path.join(app.instance_path, 'profiles'))
+        app.config.setdefault('PROFILING_KEEP', 200)
+        self.config = app.config
+        self.directory = app.config['PROFILING_DIR']
+        os.makedirs(self.directory, exist_ok=True)
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        before_render_template.connect(self._template_started, app)
+        template_rendered.connect(self._template_finished, app)
+        event.listen(Engine, 'before_cursor_execute', self._sql_started)
+        event.listen(Engine, 'after_cursor_execute', self._sql_finished)
+        event.listen(db.Model, 'load', self._orm_loaded, propagate=True)
+        app.extensions['request_profiler'] = self
+
+    # --------------------------
+    # Selecting requests
+    # --------------------------
+    def _mode(self):
+        if request.endpoint is None or request.endpoint in SKIP_ENDPOINTS \
+                or request.endpoint.startswith('admin.profile'):
+            return None
+        header = request.headers.get(self.config['PROFILING_HEADER'])
+        if header and current_user.is_authenticated and current_user.role == 'admin':
+            return 'sampling' if header.lower() == 'sampling' else 'cprofile'
+        rate = float(self.config['PROFILING_SAMPLE_RATE'])
+        if rate and random.random() < rate:
+            return self.config['PROFILING_MODE']
+        return None
+
+    def _start(self):
+        mode = self._mode()
+        if mode is None:
+            return
+        state = {
+            'mode': mode,
+            'sql_count': 0,
+            'sql_seconds': 0.0,
+            'orm_loads': Counter(),
+            'templates': [],
+            'template_started': {},
+        }
+        if mode == 'sampling':
+            state['sampler'] = _StackSampler(threading.get_ident(), float(self.config['PROFILING_SAMPLE_INTERVAL']))
+            state['sampler'].start()
+        else:
+            state['profiler'] = cProfile.Profile()
+            state['profiler'].enable()
+        state['started'] = time.perf_counter()
+        g.request_profile = state
+
+    def _finish(self, response):
+        state = g.pop('request_profile', None)
+        if state is None:
+            return response
+        duration = time.perf_counter() - state['started']
+
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        if state['mode'] == 'sampling':
+            state['sampler'].stop()
+            filename = f'{profile_id}.folded'
+            with open(os.path.join(self.directory, filename), 'w') as f:
+                f.write(state['sampler'].folded())
+        else:
+            state['profiler'].disable()
+            filename = f'{profile_id}.prof'
+            state['profiler'].dump_stats(os.path.join(self.directory, filename))
+
+        self._record({
+            'id': profile_id,
+            'file': filename,
+            'mode': state['mode'],
+            'endpoint': request.endpoint,
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'status': response.status_code,
+            'created': time.time(),
+            'duration_ms': round(duration * 1000, 2),
+            'sql_count': state['sql_count'],
+            'sql_ms': round(state['sql_seconds'] * 1000, 2),
+            'orm_loads': dict(state['orm_loads'].most_common()),
+            'templates': state['templates'],
+        })
+        response.headers['X-Profile-Id'] = profile_id
+        return response
+
+    # --------------------------
+    # Breakdown hooks
+    # --------------------------
+    @staticmethod
+    def _current():
+        return g.get('request_profile') if has_app_context() else None
+
+    def _sql_started(self, conn, cursor, statement, parameters, context, executemany):
+        if self._current() is not None:
+            conn.info.setdefault('profile_query_start', []).append(time.perf_counter())
+
+    def _sql_finished(self, conn, cursor, statement, parameters, context, executemany):
+        state = self._current()
+        starts = conn.info.get('profile_query_start')
+        if state is not None and starts:
+            state['sql_count'] += 1
+            state['sql_seconds'] += time.perf_counter() - starts.pop()
+
+    def _orm_loaded(self, target, context):
+        state = self._current()
+        if state is not None:
+            state['orm_loads'][type(target).__name__] += 1
+
+    def _template_started(self, sender, template, context, **extra):
+        state = self._current()
+        if state is not None:
+            state['template_started'][template.name] = time.perf_counter()
+
+    def _template_finished(self, sender, template, context, **extra):
+        state = self._current()
+        if state is not None and template.name in state['template_started']:
+            elapsed = time.perf_counter() - state['template_started'].pop(template.name)
+            state['templates'].append({'name': template.name or '<string>', 'ms': round(elapsed * 1000, 2)})
+
+    # --------------------------
+    # Storage
+    # --------------------------
+    def _index_path(self):
+        return os.path.join(self.directory, 'index.jsonl')
+
+    def _record(self, entry):
+        keep = int(self.config['PROFILING_KEEP'])
+        with open(self._index_path(), 'a+') as index:
+            fcntl.flock(index.fileno(), fcntl.LOCK_EX)
+            try:
+                index.write(json.dumps(entry) + '\n')
+                index.flush()
+                index.seek(0)
+                lines = index.readlines()
+                if len(lines) > keep * 2:
+                    # Prune the oldest captures so the directory doesn't grow forever
+                    for line in lines[:-keep]:
+                        path = os.path.join(self.directory, json.loads(line)['file'])
+                        if os.path.exists(path):
+                            os.remove(path)
+                    index.seek(0)
+                    index.truncate()
+                    index.writelines(lines[-keep:])
+            finally:
+                fcntl.flock(index.fileno(), fcntl.LOCK_UN)
+
+    def entries(self):
+        if not os.path.exists(self._index_path()):
+            return []
+        with open(self._index_path()) as index:
+            return [json.loads(line) for line in index if line.strip()]
+
+    def slowest(self, limit=50, endpoint=None):
+        entries = [e for e in self.entries() if endpoint in (None, e['endpoint'])]
+        return sorted(entries, key=lambda e: e['duration_ms'], reverse=True)[:limit]
+
+    def get(self, profile_id):
+        if not PROFILE_ID.match(profile_id):
+            return None
+        return next((e for e in self.entries() if e['id'] == profile_id), None)
+
+    def path(self, entry):
+        return os.path.join(self.directory, entry['file'])
+
+    def summary(self, entry, limit=30):
+        """Readable breakdown of a stored profile: top functions or hottest stacks."""
+        if entry['mode'] == 'sampling':
+            with open(self.path(entry)) as f:
+                return ''.join(f.readlines()[:limit])
+        out = io.StringIO()
+        stats = pstats.Stats(self.path(entry), stream=out)
+        stats.strip_dirs().sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+
+
+request_profiler = RequestProfiler()
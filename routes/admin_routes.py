@@ -1,11 +1,18 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session, current_app, Response, stream_with_context, send_file
 from flask_login import login_required, current_user
 from datetime import datetime
 from werkzeug.security import generate_password_hash
 from functools import wraps
-from sqlalchemy import func
+from sqlalchemy.orm import selectinload
 
-from models import db, User, Candidate, Vote, Poll
+from models import db, User, Candidate, Vote, Poll, PollArchive, candidate_vote_counts
+from voter_bitmap import voter_bitmaps
+from bulk_delete import delete_jobs, delete_poll as delete_poll_rows, delete_user as delete_user_rows
+import ledger
+from archive import vote_archive
+from db_routing import read_only, reading
+from poll_import import load_definitions, import_polls, PollImportError
+from profiling import request_profiler
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -42,9 +49,10 @@ def admin_dashboard():
     expired_polls = Poll.query.filter(Poll.end_time < current_time).all()
 
     expired_with_winners = []
-    for poll in expired_polls:
-        winner = poll.get_winner()
-        expired_with_winners.append({'poll': poll, 'winner': winner})
+    with reading():
+        for poll in expired_polls:
+            winner = poll.get_winner()
+            expired_with_winners.append({'poll': poll, 'winner': winner})
 
     stats = (
         db.session.query(Candidate.name, db.func.count(Vote.candidate_id))
@@ -89,9 +97,14 @@ def add_user():
 @login_required
 @admin_required
 def delete_user(id):
-    user = User.query.get_or_404(id)
-    db.session.delete(user)
-    db.session.commit()
+    User.query.get_or_404(id)
+    if request.args.get('background'):
+        job_id = delete_jobs.start(current_app._get_current_object(), 'user', id, on_done=voter_bitmaps.forget_user)
+        return jsonify({"message": "User deletion started", "job_id": job_id,
+                        "status_url": url_for('admin.delete_job_status', job_id=job_id)}), 202
+
+    delete_user_rows(id)
+    voter_bitmaps.forget_user(id)
     return jsonify({"message": "User deleted successfully!"})
 
 
@@ -138,10 +151,10 @@ def add_poll():
 @login_required
 @admin_required
 def add_candidate():
-    name = request.form.get('name')
+    names = [n.strip() for n in request.form.getlist('name') if n.strip()]
     poll_id = request.form.get('poll_id')
 
-    if not name or not poll_id:
+    if not names or not poll_id:
         flash("Candidate name and poll are required!", "danger")
         return redirect(url_for('admin.admin_dashboard'))
 
@@ -150,10 +163,10 @@ def add_candidate():
         flash("Selected poll does not exist.", "danger")
         return redirect(url_for('admin.admin_dashboard'))
 
-    new_candidate = Candidate(name=name, poll_id=poll.id)
-    db.session.add(new_candidate)
+    # Several name fields can be posted at once; they share one commit
+    db.session.add_all([Candidate(name=name, poll_id=poll.id) for name in names])
     db.session.commit()
-    flash(f"Candidate '{name}' added successfully to poll '{poll.title}'!", "success")
+    flash(f"Candidate '{', '.join(names)}' added successfully to poll '{poll.title}'!", "success")
     return redirect(url_for('admin.admin_dashboard'))
 
 
@@ -163,15 +176,15 @@ def add_candidate():
 @admin_bp.route('/admin/poll_stats/<int:poll_id>', methods=['GET'])
 @login_required
 @admin_required
+@read_only
 def poll_stats(poll_id):
     poll = Poll.query.get(poll_id)
     if not poll:
         return jsonify({"error": "Poll not found"}), 404
 
-    stats = []
-    for candidate in poll.candidates:
-        count = Vote.query.filter_by(candidate_id=candidate.id, poll_id=poll_id).count()
-        stats.append([candidate.name, count])
+    archived = db.session.get(PollArchive, poll_id)
+    counts = candidate_vote_counts([poll_id])
+    stats = [[candidate.name, counts.get(candidate.id, 0)] for candidate in poll.candidates]
 
     if stats:
         max_votes = max(v[1] for v in stats)
@@ -184,6 +197,8 @@ def poll_stats(poll_id):
         "poll_id": poll.id,
         "poll_title": poll.title,
         "stats": stats,
+        "turnout": archived.vote_count if archived else voter_bitmaps.turnout(poll_id),
+        "archived": archived is not None,
         "winner": winner_text
     })
 
@@ -194,21 +209,22 @@ def poll_stats(poll_id):
 @admin_bp.route('/admin/results')
 @login_required
 @admin_required
+@read_only
 def results():
-    polls = Poll.query.all()
+    polls = Poll.query.options(selectinload(Poll.candidates)).all()
+    # Live and archived polls alike, in one pass
+    counts = candidate_vote_counts()
     poll_results = []
 
     for poll in polls:
-        results = (
-            db.session.query(Candidate.name, func.count(Vote.id).label('votes'))
-            .join(Vote, Candidate.id == Vote.candidate_id, isouter=True)
-            .filter(Candidate.poll_id == poll.id)
-            .group_by(Candidate.id)
-            .order_by(db.desc('votes'))
-            .all()
+        results = sorted(
+            ((candidate.name, counts.get(candidate.id, 0)) for candidate in poll.candidates),
+            key=lambda item: item[1],
+            reverse=True,
         )
-
-        winner = poll.get_winner()
+        winner = None
+        if results and results[0][1] > 0:
+            winner = {'name': results[0][0], 'votes': results[0][1]}
         poll_results.append({
             'poll': poll,
             'results': results,
@@ -218,6 +234,58 @@ def results():
     return render_template('all_results.html', poll_results=poll_results,now=datetime.now)
 
 
+# --------------------------
+# Export Votes (CSV)
+# --------------------------
+@admin_bp.route('/admin/export_votes/<int:poll_id>')
+@login_required
+@admin_required
+@read_only
+def export_votes(poll_id):
+    poll = Poll.query.get_or_404(poll_id)
+    names = {candidate.id: candidate.name for candidate in poll.candidates}
+
+    archived = vote_archive.open(poll_id)
+    if archived is not None:
+        rows = archived.rows()
+    else:
+        rows = (
+            db.session.query(Vote.user_id, Vote.candidate_id, Vote.timestamp)
+            .filter(Vote.poll_id == poll_id)
+            .order_by(Vote.id)
+            .yield_per(10000)
+        )
+
+    def generate():
+        yield "user_id,candidate_id,candidate,timestamp\n"
+        # Rows are fetched while streaming, after the view has returned
+        with reading():
+            for user_id, candidate_id, timestamp in rows:
+                name = names.get(candidate_id, '').replace('"', '""')
+                stamp = timestamp.isoformat() if timestamp else ''
+                yield f'{user_id},{candidate_id},"{name}",{stamp}\n'
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename=poll_{poll_id}_votes.csv'},
+    )
+
+
+# --------------------------
+# Archive Closed Polls
+# --------------------------
+@admin_bp.route('/admin/archive_polls', methods=['POST'])
+@login_required
+@admin_required
+def archive_polls():
+    results = vote_archive.archive_due()
+    return jsonify({
+        "archived": {pid: n for pid, n in results.items() if isinstance(n, int)},
+        "errors": {pid: e for pid, e in results.items() if not isinstance(e, int)},
+    })
+
+
 # --------------------------
 # View Results (Single Poll)
 # --------------------------
@@ -248,20 +316,41 @@ def stop_poll(poll_id):
     return jsonify({"message": "Poll stopped successfully"}), 200
 
 
+def _forget_poll(poll_id):
+    """Drop the files kept outside the database for a deleted poll."""
+    voter_bitmaps.forget_poll(poll_id)
+    vote_archive.remove_files(poll_id)
+
+
 @admin_bp.route('/admin/delete_poll/<int:poll_id>', methods=['DELETE'])
 @login_required
 @admin_required
 def delete_poll(poll_id):
+    Poll.query.get_or_404(poll_id)
+    if request.args.get('background'):
+        # Large polls: close voting, then delete votes in chunks on a worker thread
+        job_id = delete_jobs.start(current_app._get_current_object(), 'poll', poll_id, on_done=_forget_poll)
+        return jsonify({"message": "Poll deletion started", "job_id": job_id,
+                        "status_url": url_for('admin.delete_job_status', job_id=job_id)}), 202
+
     try:
-        poll = Poll.query.get_or_404(poll_id)
-        db.session.delete(poll)
-        db.session.commit()
+        delete_poll_rows(poll_id)
+        _forget_poll(poll_id)
         return jsonify({"message": "Poll deleted successfully"}), 200
     except Exception as e:
-        db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
 
+@admin_bp.route('/admin/delete_jobs/<job_id>', methods=['GET'])
+@login_required
+@admin_required
+def delete_job_status(job_id):
+    job = delete_jobs.status(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+
 # --------------------------
 # Add Poll with Candidates
 # --------------------------
@@ -282,15 +371,11 @@ def add_poll_with_candidates():
         end_time = datetime.strptime(end_time, '%Y-%m-%dT%H:%M')
 
         new_poll = Poll(title=title, start_time=start_time, end_time=end_time, is_active=True)
-        db.session.add(new_poll)
-        db.session.commit()
-
-        candidate_names = [v for k, v in request.form.items() if k.startswith('candidate_')]
-        for name in candidate_names:
-            if name.strip():
-                candidate = Candidate(name=name.strip(), poll_id=new_poll.id)
-                db.session.add(candidate)
+        candidate_names = [v.strip() for k, v in request.form.items() if k.startswith('candidate_') and v.strip()]
+        new_poll.candidates = [Candidate(name=name) for name in candidate_names]
 
+        # Poll and candidates are committed together, so a failure leaves nothing behind
+        db.session.add(new_poll)
         db.session.commit()
         flash(f"Poll '{title}' created with {len(candidate_names)} candidates!", "success")
 
@@ -303,6 +388,86 @@ def add_poll_with_candidates():
 
 
 
+# --------------------------
+# Bulk Import Polls (JSON / YAML)
+# --------------------------
+@admin_bp.route('/admin/import_polls', methods=['POST'])
+@login_required
+@admin_required
+def import_polls_file():
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        flash("Please choose a JSON or YAML file to import.", "danger")
+        return redirect(url_for('admin.admin_dashboard'))
+
+    dry_run = bool(request.form.get('dry_run'))
+    try:
+        definitions = load_definitions(upload.read().decode('utf-8'), upload.filename)
+        summary = import_polls(definitions, dry_run=dry_run)
+    except PollImportError as e:
+        flash(str(e), "danger")
+        return redirect(url_for('admin.admin_dashboard'))
+    except Exception as e:
+        flash(f"Error importing polls: {e}", "danger")
+        return redirect(url_for('admin.admin_dashboard'))
+
+    if dry_run:
+        flash(f"Dry run: {summary['polls']} polls with {summary['candidates']} candidates are valid. Nothing was saved.", "info")
+    else:
+        flash(f"Imported {summary['polls']} polls with {summary['candidates']} candidates!", "success")
+    return redirect(url_for('admin.admin_dashboard'))
+
+
+# --------------------------
+# Verify Vote Ledger (JSON)
+# --------------------------
+@admin_bp.route('/admin/ledger/verify', methods=['GET'])
+@login_required
+@admin_required
+def verify_ledger():
+    report = ledger.verify(
+        poll_id=request.args.get('poll_id', type=int),
+        full=bool(request.args.get('full')),
+        workers=request.args.get('workers', type=int),
+    )
+    return jsonify(report), 200 if report['ok'] else 409
+
+
+# --------------------------
+# Request Profiles
+# --------------------------
+@admin_bp.route('/admin/profiles')
+@login_required
+@admin_required
+def profiles():
+    view = request.args.get('view') or None
+    entries = request_profiler.slowest(limit=request.args.get('limit', 50, type=int), endpoint=view)
+    selected = request_profiler.get(request.args.get('id', ''))
+    summary = request_profiler.summary(selected) if selected else None
+    endpoints = sorted({e['endpoint'] for e in request_profiler.entries()})
+    return render_template(
+        'admin_profiles.html',
+        entries=entries,
+        endpoints=endpoints,
+        view=view,
+        selected=selected,
+        summary=summary,
+        sample_rate=current_app.config['PROFILING_SAMPLE_RATE'],
+        header=current_app.config['PROFILING_HEADER'],
+        now=datetime.now,
+    )
+
+
+@admin_bp.route('/admin/profiles/<profile_id>/download')
+@login_required
+@admin_required
+def download_profile(profile_id):
+    entry = request_profiler.get(profile_id)
+    if entry is None:
+        return jsonify({"error": "Profile not found"}), 404
+    return send_file(request_profiler.path(entry), as_attachment=True, download_name=entry['file'])
+
+
 # --------------------------
 # Update User (AJAX)
 # --------------------------
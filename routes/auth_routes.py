@@ -77,6 +77,11 @@ def login():
 
         if user and check_password_hash(user.password, password):
             login_user(user)
+            # New session id on login, so a pre-set session cookie can't be reused
+            # (only the server-side store has ids; signed cookies carry no id)
+            regenerate = getattr(session, 'regenerate', None)
+            if regenerate is not None:
+                regenerate()
 
             if user.role == 'admin':
                 flash(f"Welcome back, Admin {user.username}!", "success")
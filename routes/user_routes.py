@@ -1,16 +1,32 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, render_template_string,jsonify
 from flask_login import login_required, current_user
-from models import db, Vote, Candidate, VotingSession, Poll
+from sqlalchemy.exc import IntegrityError
+from models import db, Vote, Candidate, VotingSession, Poll, PollArchive
 from datetime import datetime
+from dashboard import load_user_dashboard
+from voter_bitmap import voter_bitmaps
+from ledger import append_vote
+from db_routing import read_only
 
 user_bp = Blueprint('user', __name__)
 
+
+def _mark_voted(poll_id, user_id):
+    """Set the voter bit once the vote is stored.
+
+    The bitmap is only a shortcut; if this fails the unique index on
+    ``vote`` still rejects a second vote, so a failure is logged, not raised.
+    """
+    try:
+        voter_bitmaps.mark(poll_id, user_id)
+    except OSError as e:
+        print(f"Voter bitmap update failed: {e}")
+
 # --------------------------
 # User Dashboard
 # --------------------------
 @user_bp.route('/user/dashboard')
-
-
+@read_only
 def user_dashboard():
     if current_user.role == 'admin':
         flash("Admins should use the admin dashboard.", "info")
@@ -20,36 +36,15 @@ def user_dashboard():
         flash("Access denied. Invalid role.", "danger")
         return redirect(url_for('auth.login'))
 
-    current_time = datetime.utcnow()
-
-    # Active polls (still open)
-    active_polls = Poll.query.filter(Poll.end_time >= current_time).order_by(Poll.start_time.desc()).all()
-
-    # Expired polls (closed)
-    expired_polls = Poll.query.filter(Poll.end_time < current_time).order_by(Poll.end_time.desc()).all()
-
-    # User’s votes
-    # User’s votes (both poll and candidate)
-    user_votes_query = Vote.query.filter_by(user_id=current_user.id).all()
-
-    user_votes = {vote.poll_id: vote.candidate_id for vote in user_votes_query}
-    user_voted_poll_ids = list(user_votes.keys())
-
-    # Build list of winners for expired polls
-    expired_with_winners = []
-    for poll in expired_polls:
-        winner = poll.get_winner()
-        expired_with_winners.append({
-            'poll': poll,
-            'winner': winner
-        })
+    # Polls, candidates, the user's votes and winners in a fixed number of queries
+    dashboard = load_user_dashboard(current_user.id)
 
     return render_template(
         'user_dashboard.html',
-        active_polls=active_polls,
-        expired_with_winners=expired_with_winners,
-        user_voted_poll_ids=user_voted_poll_ids,
-        user_votes=user_votes
+        active_polls=dashboard.active_polls,
+        expired_with_winners=dashboard.expired_with_winners,
+        user_voted_poll_ids=dashboard.user_voted_poll_ids,
+        user_votes=dashboard.user_votes
     )
 
 # --------------------------
@@ -77,6 +72,11 @@ def vote():
         flash("Poll not found.", "danger")
         return redirect(url_for('user.user_dashboard'))
 
+    # ✅ Archived polls are final; their votes live in the archive file
+    if db.session.get(PollArchive, poll.id):
+        flash("This poll has been archived. Voting is closed.", "danger")
+        return redirect(url_for('user.user_dashboard'))
+
     # ✅ Verify candidate exists and belongs to this poll
     candidate = Candidate.query.get(candidate_id)
     if not candidate or candidate.poll_id != int(poll_id):
@@ -93,9 +93,9 @@ def vote():
         flash("Voting session for this poll has ended.", "danger")
         return redirect(url_for('user.user_dashboard'))
 
-    # ✅ Check if the user already voted in this poll
-    existing_vote = Vote.query.filter_by(user_id=current_user.id, poll_id=poll_id).first()
-    if existing_vote:
+    # ✅ Check if the user already voted in this poll (a set bit is final;
+    # otherwise the unique user/poll index decides when the vote is inserted)
+    if voter_bitmaps.has_voted(poll_id, current_user.id):
         flash("You have already voted in this poll.", "warning")
         return redirect(url_for('user.user_dashboard'))
 
@@ -108,18 +108,26 @@ def vote():
             timestamp=datetime.utcnow()  # Add timestamp if your model supports it
         )
         db.session.add(new_vote)
+        append_vote(new_vote)
         
         # ✅ Update user's has_voted flag if needed
         if not current_user.has_voted:
             current_user.has_voted = True
         
         db.session.commit()
-        flash("✅ Your vote has been successfully submitted!", "success")
+    except IntegrityError:
+        db.session.rollback()
+        _mark_voted(poll_id, current_user.id)
+        flash("You have already voted in this poll.", "warning")
+        return redirect(url_for('user.user_dashboard'))
     except Exception as e:
         db.session.rollback()
         flash(f"An error occurred while submitting your vote. Please try again.", "danger")
         print(f"Vote error: {e}")  # Log for debugging
-    
+        return redirect(url_for('user.user_dashboard'))
+
+    _mark_voted(poll_id, current_user.id)
+    flash("✅ Your vote has been successfully submitted!", "success")
     return redirect(url_for('user.user_dashboard'))
 
 
@@ -199,18 +207,29 @@ def user_vote():
 
     if not poll or not candidate:
         flash("Invalid poll or candidate.", "danger")
-        return redirect(url_for('user.user_home'))
+        return redirect(url_for('user.user_dashboard'))
+
+    if db.session.get(PollArchive, poll.id):
+        flash("This poll has been archived. Voting is closed.", "danger")
+        return redirect(url_for('user.user_dashboard'))
 
     # Check if the user already voted in this poll
-    existing_vote = Vote.query.filter_by(user_id=current_user.id, poll_id=poll_id).first()
-    if existing_vote:
+    if voter_bitmaps.has_voted(poll_id, current_user.id):
         flash("You have already voted in this poll!", "warning")
-        return redirect(url_for('user.user_home'))
+        return redirect(url_for('user.user_dashboard'))
 
     # Record the vote
     new_vote = Vote(user_id=current_user.id, candidate_id=candidate_id, poll_id=poll_id)
-    db.session.add(new_vote)
-    db.session.commit()
+    try:
+        db.session.add(new_vote)
+        append_vote(new_vote)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        _mark_voted(poll_id, current_user.id)
+        flash("You have already voted in this poll!", "warning")
+        return redirect(url_for('user.user_dashboard'))
+    _mark_voted(poll_id, current_user.id)
 
     flash("Your vote has been recorded successfully!", "success")
     return redirect(url_for('user.user_dashboard'))
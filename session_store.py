@@ -0,0 +1,247 @@
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+
+# ------------------------------
+# Session Object
+# ------------------------------
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session data kept on the server; only the session id goes in the cookie."""
+
+    def __init__(self, initial=None, sid=None, expires_at=None, new=False):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires_at = expires_at
+        self.new = new
+        self.modified = False
+        self.previous_sid = None
+
+    def regenerate(self):
+        """Move the session to a fresh id; the old id's row is deleted on save.
+
+        Call this whenever privileges change (e.g. right after login) so a
+        session id planted before the change is worthless afterwards.
+        """
+        if self.previous_sid is None and not self.new:
+            self.previous_sid = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.modified = True
+
+
+# ------------------------------
+# Backends
+# ------------------------------
+class MemorySessionBackend:
+    """Process-local store with a cache-like get/set/delete API.
+
+    Stands in for a shared cache (memcached/redis) in development; sessions are
+    not shared between workers.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, sid):
+        with self._lock:
+            item = self._data.get(sid)
+        if item is None or item[1] <= time.time():
+            return None
+        return item
+
+    def set(self, sid, data, expires):
+        with self._lock:
+            self._data[sid] = (data, expires)
+
+    def touch(self, sid, expires):
+        with self._lock:
+            if sid in self._data:
+                self._data[sid] = (self._data[sid][0], expires)
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+    def sweep(self, now):
+        with self._lock:
+            expired = [sid for sid, (_, expires) in self._data.items() if expires <= now]
+            for sid in expired:
+                del self._data[sid]
+        return len(expired)
+
+
+class SQLiteSessionBackend:
+    """Sessions in their own SQLite file, shared by every worker on the host."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS session ('
+                ' id TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_session_expires ON session (expires)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, sid):
+        row = self._connect().execute(
+            'SELECT data, expires FROM session WHERE id = ? AND expires > ?',
+            (sid, time.time()),
+        ).fetchone()
+        return row
+
+    def set(self, sid, data, expires):
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO session (id, data, expires) VALUES (?, ?, ?)',
+                (sid, data, expires),
+            )
+
+    def touch(self, sid, expires):
+        with self._connect() as conn:
+            conn.execute('UPDATE session SET expires = ? WHERE id = ?', (expires, sid))
+
+    def delete(self, sid):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM session WHERE id = ?', (sid,))
+
+    def sweep(self, now):
+        with self._connect() as conn:
+            return conn.execute('DELETE FROM session WHERE expires <= ?', (now,)).rowcount
+
+
+# ------------------------------
+# Session Interface
+# ------------------------------
+class ServerSideSessionInterface(SessionInterface):
+    """Flask session interface that writes to the backend only when needed.
+
+    A request that doesn't change the session sends no Set-Cookie header and
+    doesn't touch the store. Permanent sessions are slid forward once less than
+    half of their lifetime is left, rather than on every request.
+    """
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def _lifetime(self, app):
+        return app.permanent_session_lifetime.total_seconds()
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            item = self.backend.get(sid)
+            if item is not None:
+                data, expires = item
+                return ServerSideSession(self.serializer.loads(data), sid=sid, expires_at=expires)
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.previous_sid is not None:
+            self.backend.delete(session.previous_sid)
+
+        if not session:
+            if session.modified and not session.new:
+                self.backend.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = time.time()
+        lifetime = self._lifetime(app)
+        expires = now + lifetime
+
+        if session.modified:
+            self.backend.set(session.sid, self.serializer.dumps(dict(session)), expires)
+        elif session.permanent and session.expires_at - now < lifetime / 2:
+            self.backend.touch(session.sid, expires)
+        else:
+            return
+
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+        response.vary.add('Cookie')
+
+
+class ServerSideSessions:
+    """Installs the server-side session interface and its expiry sweeper.
+
+    Config:
+        SESSION_BACKEND         'sqlite' (default) or 'memory'
+        SESSION_SQLITE_PATH     defaults to <instance>/sessions.db
+        SESSION_SWEEP_INTERVAL  seconds between expiry sweeps (default 300)
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self._sweeper = None
+        self._stop = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SESSION_BACKEND', 'sqlite')
+        app.config.setdefault('SESSION_SQLITE_PATH', os.path.join(app.instance_path, 'sessions.db'))
+        app.config.setdefault('SESSION_SWEEP_INTERVAL', 300)
+
+        backend = app.config['SESSION_BACKEND']
+        if backend == 'memory':
+            self.backend = MemorySessionBackend()
+        elif backend == 'sqlite':
+            os.makedirs(os.path.dirname(app.config['SESSION_SQLITE_PATH']), exist_ok=True)
+            self.backend = SQLiteSessionBackend(app.config['SESSION_SQLITE_PATH'])
+        else:
+            raise ValueError(f"Unknown SESSION_BACKEND: {backend!r}")
+
+        app.session_interface = ServerSideSessionInterface(self.backend)
+        app.extensions['server_sessions'] = self
+        self._start_sweeper(float(app.config['SESSION_SWEEP_INTERVAL']))
+
+    def _start_sweeper(self, interval):
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.backend.sweep(time.time())
+                except sqlite3.Error as e:
+                    print(f"Session sweep error: {e}")
+
+        self._sweeper = threading.Thread(target=run, name='session-sweeper', daemon=True)
+        self._sweeper.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+server_sessions = ServerSideSessions()
@@ -0,0 +1,15 @@
+function validateForm() {
+  const password = document.getElementById("password").value;
+  const confirmPassword = document.getElementById("confirm_password").value;
+
+  if (password.length < 8) {
+    alert("Password must be at least 8 characters long.");
+    return false;
+  }
+
+  if (password !== confirmPassword) {
+    alert("Passwords do not match!");
+    return false;
+  }
+  return true;
+}
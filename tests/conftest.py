@@ -0,0 +1,43 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """The app, pointed at a scratch directory like bench.py does."""
+    from bench import scratch_app
+    return scratch_app(str(tmp_path_factory.mktemp('instance')))
+
+
+@pytest.fixture
+def db(app):
+    """An app context with empty tables, cleared again after the test."""
+    from models import db
+    from voter_bitmap import voter_bitmaps
+
+    with app.app_context():
+        yield db
+        db.session.rollback()
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
+        # SQLite reuses the ids, so don't leave bits behind for the next test
+        voter_bitmaps.rebuild_all()
+
+
+@pytest.fixture
+def admin_client(app, db):
+    """A test client logged in as an admin."""
+    from werkzeug.security import generate_password_hash
+    from models import User
+
+    db.session.add(User(username='admin', email='admin@example.com', phone='0',
+                        password=generate_password_hash('pw'), role='admin'))
+    db.session.commit()
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'pw'})
+    return client
@@ -0,0 +1,146 @@
+import struct
+from datetime import datetime, timedelta
+
+import pytest
+import xxhash
+import zstandard
+from werkzeug.security import generate_password_hash
+
+import ledger
+from archive import _pack, vote_archive
+from models import User, Poll, Candidate, Vote, PollArchive, ArchivedTally, candidate_vote_counts
+from voter_bitmap import voter_bitmaps
+
+
+@pytest.fixture
+def archived_poll(app, db):
+    now = datetime.utcnow()
+    poll = Poll(title='Old poll', start_time=now - timedelta(days=1), end_time=now + timedelta(days=1))
+    poll.candidates = [Candidate(name='A'), Candidate(name='B')]
+    db.session.add(poll)
+    db.session.add(User(username='voter', email='voter@example.com', phone='0',
+                        password=generate_password_hash('pw'), role='user'))
+    db.session.commit()
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'voter', 'password': 'pw'})
+    client.post('/vote', data={'poll_id': poll.id, 'candidate_id': poll.candidates[0].id})
+
+    poll.end_time = now - timedelta(days=60)
+    db.session.commit()
+    assert vote_archive.archive_poll(poll.id) == 1
+    yield poll, client
+    vote_archive.remove_files(poll.id)
+
+
+def test_restart_keeps_archived_voters(db, archived_poll):
+    poll, _ = archived_poll
+    user_id = User.query.filter_by(username='voter').one().id
+
+    voter_bitmaps.rebuild_all()  # what every worker does on startup
+    assert voter_bitmaps.has_voted(poll.id, user_id)
+    assert voter_bitmaps.turnout(poll.id) == 1
+    assert poll.id not in voter_bitmaps.verify()
+
+
+@pytest.mark.parametrize('url', ['/vote', '/user/vote'])
+def test_archived_poll_rejects_new_votes(db, archived_poll, url):
+    poll, client = archived_poll
+    voter_bitmaps.forget_poll(poll.id)  # even without the bitmap's help
+
+    client.post(url, data={'poll_id': poll.id, 'candidate_id': poll.candidates[0].id})
+    assert Vote.query.filter_by(poll_id=poll.id).count() == 0
+    assert candidate_vote_counts([poll.id])[poll.candidates[0].id] == 1
+
+
+def test_deleting_a_voter_keeps_their_archived_vote(db, archived_poll, admin_client):
+    poll, _ = archived_poll
+    user_id = User.query.filter_by(username='voter').one().id
+
+    assert admin_client.delete(f'/admin/delete_user/{user_id}').status_code == 200
+    assert voter_bitmaps.has_voted(poll.id, user_id)
+    assert poll.id not in voter_bitmaps.verify()
+    stats = admin_client.get(f'/admin/poll_stats/{poll.id}').get_json()
+    assert stats['turnout'] == voter_bitmaps.turnout(poll.id) == 1
+
+
+def archive_problems(poll, full=False):
+    report = ledger.verify(full=full, workers=1)
+    return report['ok'], report['polls'][poll.id]['problems']
+
+
+def test_untouched_archive_verifies(db, archived_poll):
+    poll, _ = archived_poll
+    assert archive_problems(poll, full=True) == (True, [])
+
+
+def test_edited_tally_is_reported(db, archived_poll):
+    poll, _ = archived_poll
+    candidate_id = poll.candidates[0].id
+    ArchivedTally.query.filter_by(poll_id=poll.id, candidate_id=candidate_id).update({'votes': 1000})
+    db.session.commit()
+
+    assert archive_problems(poll) == (False, [
+        f'poll {poll.id} archive: candidate {candidate_id} has 1000 vote(s) in the tally, 1 in the archive'
+    ])
+
+
+def test_edited_cache_is_reported_and_unpacked_again(db, archived_poll):
+    poll, _ = archived_poll
+    user_id = User.query.filter_by(username='voter').one().id
+    archived = vote_archive.open(poll.id)
+    offset = archived.user_ids.ctypes.data - archived._raw.ctypes.data
+    del archived
+    with open(vote_archive._cache_path(poll.id), 'r+b') as f:
+        f.seek(offset)
+        f.write(struct.pack('<i', 999))
+
+    ok, problems = archive_problems(poll)
+    assert not ok
+    assert problems == [f'poll {poll.id} archive: unpacked cache was altered; unpacked it again']
+    assert vote_archive.open(poll.id).user_ids.tolist() == [user_id]
+    assert archive_problems(poll) == (True, [])
+
+
+def test_edited_cache_is_not_served(db, archived_poll):
+    poll, _ = archived_poll
+    user_id = User.query.filter_by(username='voter').one().id
+    vote_archive.open(poll.id)
+    with open(vote_archive._cache_path(poll.id), 'r+b') as f:
+        f.seek(-1, 2)
+        f.write(b'\xff')
+
+    assert vote_archive.open(poll.id).user_ids.tolist() == [user_id]
+
+
+def test_ledger_head_is_checked_on_full_verify(db, archived_poll):
+    poll, _ = archived_poll
+    record = db.session.get(PollArchive, poll.id)
+    record.ledger_head = '0' * 64
+    db.session.commit()
+
+    assert archive_problems(poll) == (True, [])
+    assert archive_problems(poll, full=True) == (False, [
+        f'poll {poll.id} archive: ledger chain does not match the recorded head'
+    ])
+
+
+def test_rewritten_archive_is_checked_against_its_chain(db, archived_poll):
+    poll, _ = archived_poll
+    # Move the vote to the other candidate and re-seal file, checksum and tally
+    archived = vote_archive.open(poll.id)
+    votes = [(vote_id, poll.candidates[1].id, user_id, timestamp)
+             for vote_id, (user_id, _, timestamp) in archived.votes().items()]
+    raw = _pack(votes, list(archived.ledger_entries()))
+    del archived
+    vote_archive.remove_files(poll.id)
+    with open(vote_archive._path(poll.id), 'wb') as f:
+        f.write(zstandard.ZstdCompressor().compress(raw))
+    db.session.get(PollArchive, poll.id).checksum = xxhash.xxh64(raw).hexdigest()
+    for tally in ArchivedTally.query.filter_by(poll_id=poll.id):
+        tally.votes = 1 - tally.votes
+    db.session.commit()
+
+    ok, problems = archive_problems(poll, full=True)
+    assert not ok
+    assert problems == [f'poll {poll.id} archive: vote {votes[0][0]} differs from the ledger']
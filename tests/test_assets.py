@@ -0,0 +1,54 @@
+import gzip
+import os
+
+import pytest
+import zstandard
+
+from assets import IMMUTABLE, assets
+
+
+@pytest.fixture
+def asset(app):
+    """(logical name, hashed name, original bytes) of one built asset."""
+    logical, hashed = sorted(assets.manifest.items())[0]
+    with open(os.path.join(app.static_folder, logical), 'rb') as f:
+        return logical, hashed, f.read()
+
+
+def decode(response):
+    encoding = response.headers.get('Content-Encoding')
+    if encoding == 'zstd':
+        return zstandard.ZstdDecompressor().decompressobj().decompress(response.data)
+    if encoding == 'gzip':
+        return gzip.decompress(response.data)
+    return response.data
+
+
+@pytest.mark.parametrize('filename', ['manifest.json', 'css/login.css', '../app.py', 'nope.css'])
+def test_names_outside_the_manifest_are_not_served(app, filename):
+    assert app.test_client().get(f'/assets/{filename}').status_code == 404
+
+
+@pytest.mark.parametrize('accept, encoding', [
+    ('zstd, gzip', 'zstd'),
+    ('gzip, zstd', 'zstd'),  # preferred whenever the client takes it
+    ('gzip', 'gzip'),
+    ('br', None),
+    (None, None),
+])
+def test_encoding_is_negotiated(app, asset, accept, encoding):
+    _, hashed, original = asset
+    headers = {'Accept-Encoding': accept} if accept else {}
+    response = app.test_client().get(f'/assets/{hashed}', headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers.get('Content-Encoding') == encoding
+    assert decode(response) == original
+    assert response.headers['Cache-Control'] == IMMUTABLE
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+
+def test_asset_url_points_at_the_fingerprinted_file(app, asset):
+    logical, hashed, _ = asset
+    with app.test_request_context():
+        assert assets.url(logical) == f'/assets/{hashed}'
@@ -0,0 +1,148 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import ledger
+from archive import vote_archive
+from bulk_delete import delete_jobs, delete_poll
+from models import (User, Poll, Candidate, Vote, LedgerEntry, LedgerCheckpoint,
+                    PollArchive, ArchivedTally)
+from voter_bitmap import voter_bitmaps
+
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(ledger, 'CHECKPOINT_SIZE', 2)
+
+
+@pytest.fixture
+def poll_id(db):
+    """Id of an open poll with five voters, each of whom has voted."""
+    now = datetime.utcnow()
+    poll = Poll(title='Big poll', start_time=now - timedelta(days=1), end_time=now + timedelta(days=1))
+    poll.candidates = [Candidate(name='A'), Candidate(name='B')]
+    db.session.add(poll)
+    # They never log in, so skip hashing a password for each
+    users = [User(username=f'voter{i}', email=f'voter{i}@example.com', phone='0',
+                  password='!', role='user') for i in range(5)]
+    db.session.add_all(users)
+    db.session.commit()
+    for i, user in enumerate(users):
+        vote = Vote(user_id=user.id, candidate_id=poll.candidates[i % 2].id, poll_id=poll.id,
+                    timestamp=datetime.utcnow())
+        db.session.add(vote)
+        ledger.append_vote(vote)
+        db.session.commit()
+        voter_bitmaps.mark(poll.id, user.id)
+    poll_id = poll.id
+    yield poll_id
+    vote_archive.remove_files(poll_id)
+
+
+def archive(db, poll_id):
+    db.session.get(Poll, poll_id).end_time = datetime.utcnow() - timedelta(days=60)
+    db.session.commit()
+    vote_archive.archive_poll(poll_id)
+
+
+def wait(get_status):
+    deadline = time.monotonic() + 10
+    while (status := get_status())['status'] == 'running':
+        assert time.monotonic() < deadline, 'delete job did not finish'
+        time.sleep(0.02)
+    return status
+
+
+def assert_poll_gone(db, poll_id):
+    db.session.expire_all()
+    assert db.session.get(Poll, poll_id) is None
+    for model in (Candidate, Vote, LedgerEntry, LedgerCheckpoint, PollArchive, ArchivedTally):
+        assert model.query.filter_by(poll_id=poll_id).count() == 0
+
+
+@pytest.mark.parametrize('chunk_size, reported', [(None, [5]), (2, [2, 4, 5])])
+def test_delete_poll(db, poll_id, chunk_size, reported):
+    progress = []
+    assert delete_poll(poll_id, chunk_size=chunk_size, progress=progress.append) == 5
+    assert progress == reported
+    assert_poll_gone(db, poll_id)
+
+
+def test_delete_poll_removes_archive_rows(db, poll_id):
+    archive(db, poll_id)
+    assert delete_poll(poll_id) == 0
+    assert_poll_gone(db, poll_id)
+
+
+def test_delete_job_reports_progress_and_calls_on_done(app, db, poll_id):
+    done = []
+    job_id = delete_jobs.start(app, 'poll', poll_id, on_done=done.append, chunk_size=2)
+
+    job = wait(lambda: delete_jobs.status(job_id))
+    assert job['status'] == 'done'
+    assert (job['kind'], job['target_id']) == ('poll', poll_id)
+    assert job['votes_total'] == job['votes_deleted'] == 5
+    assert job['error'] is None and job['finished'] >= job['started']
+    assert done == [poll_id]
+    assert_poll_gone(db, poll_id)
+
+
+def test_failed_delete_job_is_reported(app, db, poll_id):
+    def on_done(poll_id):
+        raise OSError('disk full')
+
+    job_id = delete_jobs.start(app, 'poll', poll_id, on_done=on_done)
+    job = wait(lambda: delete_jobs.status(job_id))
+    assert job['status'] == 'failed'
+    assert job['error'] == 'disk full'
+
+
+def test_unknown_delete_job(db, admin_client):
+    assert delete_jobs.status('nope') is None
+    assert admin_client.get('/admin/delete_jobs/nope').status_code == 404
+
+
+@pytest.mark.parametrize('background', [False, True])
+def test_delete_poll_route_drops_bitmap_and_archive_files(db, poll_id, admin_client, background):
+    voter_id = User.query.filter_by(username='voter0').one().id
+    archive(db, poll_id)
+    vote_archive.open(poll_id)  # unpack the cache too
+    files = [vote_archive._path(poll_id), vote_archive._cache_path(poll_id)]
+    assert all(os.path.exists(path) for path in files)
+
+    url = f'/admin/delete_poll/{poll_id}' + ('?background=1' if background else '')
+    response = admin_client.delete(url)
+    if background:
+        assert response.status_code == 202
+        status_url = response.get_json()['status_url']
+        job = wait(lambda: admin_client.get(status_url).get_json())
+        assert job['status'] == 'done'
+    else:
+        assert response.status_code == 200
+
+    assert_poll_gone(db, poll_id)
+    assert not voter_bitmaps.has_voted(poll_id, voter_id)
+    assert not any(os.path.exists(path) for path in files)
+
+
+@pytest.mark.parametrize('background', [False, True])
+def test_delete_user_route_clears_their_bits(db, poll_id, admin_client, background):
+    user_id = User.query.filter_by(username='voter0').one().id
+
+    url = f'/admin/delete_user/{user_id}' + ('?background=1' if background else '')
+    response = admin_client.delete(url)
+    if background:
+        assert response.status_code == 202
+        job = wait(lambda: admin_client.get(response.get_json()['status_url']).get_json())
+        assert (job['status'], job['votes_total'], job['votes_deleted']) == ('done', 1, 1)
+    else:
+        assert response.status_code == 200
+
+    db.session.expire_all()
+    assert db.session.get(User, user_id) is None
+    assert Vote.query.filter_by(poll_id=poll_id).count() == 4
+    assert not voter_bitmaps.has_voted(poll_id, user_id)
+    assert voter_bitmaps.turnout(poll_id) == 4
+    assert ledger.verify(poll_id=poll_id, full=True, workers=1)['ok']
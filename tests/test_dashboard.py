@@ -0,0 +1,86 @@
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from flask import render_template
+from flask_login import login_user
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+from dashboard import load_user_dashboard
+from models import User, Poll, Candidate, Vote
+
+
+@contextmanager
+def count_queries(engine):
+    """Count statements this thread sends to ``engine`` (the replica refresher has its own)."""
+    thread = threading.get_ident()
+    queries = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        if threading.get_ident() == thread:
+            queries.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield queries
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def seed(db, user, polls):
+    """Half the polls active, half expired; the user votes in each."""
+    now = datetime.utcnow()
+    for i in range(polls):
+        end = now + timedelta(days=1) if i % 2 else now - timedelta(days=1)
+        poll = Poll(title=f'Poll {i}', start_time=now - timedelta(days=2), end_time=end)
+        poll.candidates = [Candidate(name=f'Candidate {i}.{j}') for j in range(3)]
+        db.session.add(poll)
+        db.session.flush()
+        db.session.add(Vote(user_id=user.id, candidate_id=poll.candidates[0].id, poll_id=poll.id))
+    db.session.commit()
+
+
+@pytest.fixture
+def user(db):
+    user = User(username='voter', email='voter@example.com', phone='0',
+                password=generate_password_hash('pw'), role='user')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def test_query_count_does_not_grow_with_polls(db, user):
+    user_id = user.id
+    counts = []
+    for polls in (2, 20, 60):
+        seed(db, user, polls - Poll.query.count())
+        db.session.expire_all()
+        with count_queries(db.engine) as queries:
+            dashboard = load_user_dashboard(user_id)
+        assert len(dashboard.active_polls) + len(dashboard.expired_with_winners) == polls
+        counts.append(len(queries))
+
+    # Polls, candidates, the user's votes, live and archived counts
+    assert counts == [5, 5, 5]
+
+
+def test_rendering_does_not_lazy_load(app, db, user):
+    seed(db, user, 10)
+    with app.test_request_context('/user/dashboard'):
+        login_user(user)
+        dashboard = load_user_dashboard(user.id)
+        # Anything still bound to the session would have to reload now
+        db.session.expire_all()
+        db.session.refresh(user)  # current_user itself may reload
+        with count_queries(db.engine) as queries:
+            html = render_template(
+                'user_dashboard.html',
+                active_polls=dashboard.active_polls,
+                expired_with_winners=dashboard.expired_with_winners,
+                user_voted_poll_ids=dashboard.user_voted_poll_ids,
+                user_votes=dashboard.user_votes,
+            )
+    assert 'Poll 9' in html
+    assert queries == []
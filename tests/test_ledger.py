@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import ledger
+from archive import vote_archive
+from bulk_delete import delete_user
+from models import Poll, Candidate, Vote, LedgerEntry
+
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(ledger, 'CHECKPOINT_SIZE', 4)
+
+
+@pytest.fixture
+def poll(db):
+    now = datetime.utcnow()
+    poll = Poll(title='Ledger poll', start_time=now - timedelta(days=1), end_time=now + timedelta(days=1))
+    poll.candidates = [Candidate(name='A'), Candidate(name='B')]
+    db.session.add(poll)
+    db.session.commit()
+    return poll
+
+
+def vote(db, poll, user_id):
+    new_vote = Vote(user_id=user_id, candidate_id=poll.candidates[user_id % 2].id, poll_id=poll.id,
+                    timestamp=datetime.utcnow())
+    db.session.add(new_vote)
+    ledger.append_vote(new_vote)
+    db.session.commit()
+    return new_vote
+
+
+def problems(poll, full=False):
+    return ledger.verify(poll_id=poll.id, full=full, workers=1)['polls'][poll.id]['problems']
+
+
+@pytest.mark.parametrize('chunk_size', [None, 1])
+def test_deleting_a_voter_keeps_the_ledger_valid(db, poll, chunk_size):
+    for user_id in range(1, 11):
+        vote(db, poll, user_id)
+    assert problems(poll) == []
+
+    delete_user(3, chunk_size=chunk_size)
+    assert Vote.query.filter_by(user_id=3).count() == 0
+    assert LedgerEntry.query.filter_by(kind=ledger.DELETED, vote_id=3).count() == 1
+    assert problems(poll) == []
+    assert problems(poll, full=True) == []
+
+
+def test_removal_without_a_tombstone_is_still_reported(db, poll):
+    for user_id in range(1, 6):
+        vote(db, poll, user_id)
+    ledger.verify(poll_id=poll.id, workers=1)
+
+    db.session.delete(Vote.query.filter_by(user_id=2).one())
+    db.session.commit()
+    assert problems(poll) == [f'poll {poll.id} seq 1-4: vote 2 differs from the ledger']
+
+
+def test_reused_vote_id_after_a_delete(db, poll):
+    for user_id in range(1, 4):
+        vote(db, poll, user_id)
+    last = Vote.query.filter_by(user_id=3).one().id
+    delete_user(3)
+
+    # SQLite hands the highest rowid out again
+    assert vote(db, poll, 4).id == last
+    assert problems(poll, full=True) == []
+
+
+def test_poll_with_a_deleted_voter_can_be_archived(db, poll):
+    for user_id in range(1, 6):
+        vote(db, poll, user_id)
+    delete_user(5)
+    vote(db, poll, 6)  # reuses the deleted vote's id
+    delete_user(2)
+    poll.end_time = datetime.utcnow() - timedelta(days=60)
+    db.session.commit()
+
+    assert vote_archive.archive_poll(poll.id) == 4
+    assert LedgerEntry.query.filter_by(poll_id=poll.id).count() == 0
+    # The chain, tombstones included, now lives in the archive file
+    report = ledger.verify(poll_id=poll.id, full=True, workers=1)
+    assert report['polls'][poll.id] == {'blocks': 0, 'archived': True, 'problems': []}
+    vote_archive.remove_files(poll.id)
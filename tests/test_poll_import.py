@@ -0,0 +1,74 @@
+import pytest
+
+from poll_import import PollImportError, validate
+
+
+def definition(**overrides):
+    item = {
+        'title': 'Board election',
+        'start_time': '2025-01-01 09:00',
+        'end_time': '2025-01-02 09:00',
+        'candidates': ['Ada', 'Grace'],
+    }
+    item.update(overrides)
+    return item
+
+
+@pytest.mark.parametrize('value', [True, False])
+def test_is_active_accepts_booleans(value):
+    poll_rows, _ = validate([definition(is_active=value)])
+    assert poll_rows[0]['is_active'] is value
+
+
+def test_is_active_defaults_to_true():
+    poll_rows, _ = validate([definition()])
+    assert poll_rows[0]['is_active'] is True
+
+
+@pytest.mark.parametrize('value', ['false', '0', 'yes', 0, 1, None])
+def test_is_active_rejects_non_booleans(value):
+    with pytest.raises(PollImportError) as excinfo:
+        validate([definition(is_active=value)])
+    assert excinfo.value.errors == [
+        f"poll #1 ('Board election'): is_active must be true or false, got {value!r}"
+    ]
+
+
+@pytest.mark.parametrize('names, bad', [
+    (['Alice', None, {'x': 1}], "None, {'x': 1}"),
+    (['Alice', 42], '42'),
+    (['Alice', ['Bob']], "['Bob']"),
+])
+def test_candidates_reject_non_string_entries(names, bad):
+    with pytest.raises(PollImportError) as excinfo:
+        validate([definition(candidates=names)])
+    assert excinfo.value.errors == [
+        f"poll #1 ('Board election'): candidate names must be text, got {bad}"
+    ]
+
+
+@pytest.mark.parametrize('value', [42, ['Board'], {'name': 'Board'}, True])
+def test_title_rejects_non_strings(value):
+    with pytest.raises(PollImportError) as excinfo:
+        validate([definition(title=value)])
+    assert excinfo.value.errors == [f"poll #1: title must be text, got {value!r}"]
+
+
+@pytest.mark.parametrize('value', [None, '', '   '])
+def test_title_is_required(value):
+    with pytest.raises(PollImportError) as excinfo:
+        validate([definition(title=value)])
+    assert excinfo.value.errors == ["poll #1: title is required"]
+
+
+def test_yaml_null_and_mapping_candidates_are_rejected():
+    yaml = pytest.importorskip('yaml')
+    item = yaml.safe_load("""
+title: Board election
+start_time: 2025-01-01 09:00
+end_time: 2025-01-02 09:00
+candidates: [Alice, ~, {x: 1}]
+""")
+    with pytest.raises(PollImportError) as excinfo:
+        validate([item])
+    assert "candidate names must be text" in excinfo.value.errors[0]
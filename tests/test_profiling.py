@@ -0,0 +1,60 @@
+import os
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from models import User
+from profiling import request_profiler
+
+
+@pytest.fixture(autouse=True)
+def profile_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(request_profiler, 'directory', str(tmp_path))
+    return tmp_path
+
+
+def test_header_is_ignored_for_non_admins(app, db):
+    db.session.add(User(username='voter', email='voter@example.com', phone='0',
+                        password=generate_password_hash('pw'), role='user'))
+    db.session.commit()
+    client = app.test_client()
+    client.post('/login', data={'username': 'voter', 'password': 'pw'})
+
+    response = client.get('/user/dashboard', headers={'X-Profile': '1'})
+    assert response.status_code == 200
+    assert 'X-Profile-Id' not in response.headers
+    assert request_profiler.entries() == []
+
+
+@pytest.mark.parametrize('header, mode, suffix', [('1', 'cprofile', '.prof'), ('sampling', 'sampling', '.folded')])
+def test_header_is_honoured_for_admins(db, admin_client, header, mode, suffix):
+    response = admin_client.get('/admin/dashboard', headers={'X-Profile': header})
+    assert response.status_code == 200
+
+    entry = request_profiler.get(response.headers['X-Profile-Id'])
+    assert entry['mode'] == mode
+    assert entry['endpoint'] == 'admin.admin_dashboard'
+    assert entry['file'].endswith(suffix)
+    assert entry['sql_count'] > 0
+    assert os.path.exists(request_profiler.path(entry))
+
+
+def test_only_the_newest_profiles_are_kept(app, db, admin_client, monkeypatch, profile_dir):
+    monkeypatch.setitem(app.config, 'PROFILING_KEEP', 2)
+    ids = [
+        admin_client.get('/admin/dashboard', headers={'X-Profile': '1'}).headers['X-Profile-Id']
+        for _ in range(5)
+    ]
+
+    # Pruned back to 2 once the index went past 2 * PROFILING_KEEP
+    assert [e['id'] for e in request_profiler.entries()] == ids[-2:]
+    assert sorted(os.listdir(profile_dir)) == sorted([f'{i}.prof' for i in ids[-2:]] + ['index.jsonl'])
+
+
+@pytest.mark.parametrize('profile_id', ['../index', 'a/b', '..', 'x y'])
+def test_get_rejects_ids_that_are_not_plain_names(app, profile_id):
+    # Even an index line carrying the id doesn't get it through
+    request_profiler._record({'id': profile_id, 'file': 'index.jsonl'})
+    request_profiler._record({'id': '20250101-000000-abc123', 'file': 'x.prof'})
+    assert request_profiler.get(profile_id) is None
+    assert request_profiler.get('20250101-000000-abc123')['file'] == 'x.prof'
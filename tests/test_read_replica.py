@@ -0,0 +1,74 @@
+import os
+import sqlite3
+import time
+
+import pytest
+from flask import Flask, session
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+
+from db_routing import ReadReplica
+
+
+@pytest.fixture(autouse=True)
+def no_background_thread(monkeypatch):
+    """Tests drive refreshes and heartbeats themselves."""
+    monkeypatch.setattr(ReadReplica, '_start', lambda self, loop, interval: None)
+
+
+def replica_app(tmp_path, **config):
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'test'
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'primary.db'}"
+    app.config['READ_REPLICA_PATH'] = str(tmp_path / 'replica' / 'voting.db')
+    app.config.update(config)
+    db = SQLAlchemy()
+    db.init_app(app)
+    return app, db
+
+
+def test_snapshot_is_shared_per_host_and_primary_uses_wal(tmp_path):
+    app, db = replica_app(tmp_path)
+    first = ReadReplica(app, db)
+    second_app, second_db = replica_app(tmp_path)
+    second = ReadReplica(second_app, second_db)
+
+    with first.primary.connect() as conn:
+        assert conn.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+
+    with open(f'{first.path}.lock', 'a') as lock:
+        first._refresh_if_due(lock, interval=5)
+        second._refresh_if_due(lock, interval=5)  # already fresh: no second copy
+    assert first.path == second.path == app.config['READ_REPLICA_PATH']
+    assert sorted(os.listdir(tmp_path / 'replica')) == ['voting.db', 'voting.db.lock']
+    assert sqlite3.connect(first.path).execute('PRAGMA journal_mode').fetchone()[0] == 'delete'
+
+    # A snapshot taken by one worker is picked up by the other
+    first.refresh()
+    second._follow_snapshot()
+    assert second.taken_at == first.taken_at == os.stat(first.path).st_mtime
+
+
+def test_external_replica_lag_and_read_your_writes(tmp_path):
+    replica_uri = f"sqlite:///{tmp_path / 'replica.db'}"
+    app, db = replica_app(tmp_path, READ_REPLICA_URI=replica_uri, READ_REPLICA_MAX_STALENESS=15)
+    replica = ReadReplica(app, db)
+    with replica.engine.begin() as conn:
+        conn.exec_driver_sql('CREATE TABLE replica_heartbeat (id INTEGER PRIMARY KEY, beat FLOAT NOT NULL)')
+
+    def replicate(beat):
+        with replica.engine.begin() as conn:
+            conn.execute(text('INSERT OR REPLACE INTO replica_heartbeat (id, beat) VALUES (1, :beat)'), {'beat': beat})
+
+    # Replica stuck a minute behind: too stale
+    replicate(time.time() - 60)
+    replica.heartbeat()
+    assert replica.engine_for_read() is None
+
+    # Caught up: reads may use it, except for a client that wrote after the beat
+    replicate(time.time())
+    replica.heartbeat()
+    with app.test_request_context():
+        assert replica.engine_for_read() is replica.engine
+        session['_last_write'] = time.time()
+        assert replica.engine_for_read() is None
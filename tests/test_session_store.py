@@ -0,0 +1,38 @@
+from werkzeug.security import generate_password_hash
+
+from models import User
+
+
+def test_login_issues_a_new_session_id(app, db):
+    db.session.add(User(username='voter', email='voter@example.com', phone='0',
+                        password=generate_password_hash('pw'), role='user'))
+    db.session.commit()
+    backend = app.session_interface.backend
+    cookie = app.config['SESSION_COOKIE_NAME']
+
+    client = app.test_client()
+    # A session id that exists before login, e.g. one planted by an attacker
+    with client.session_transaction() as session:
+        session['planted'] = True
+    before = client.get_cookie(cookie).value
+    assert backend.get(before) is not None
+
+    client.post('/login', data={'username': 'voter', 'password': 'pw'})
+    after = client.get_cookie(cookie).value
+    assert after != before
+    assert backend.get(before) is None
+    assert backend.get(after) is not None
+    assert client.get('/user/dashboard').status_code == 200
+
+
+def test_login_works_with_signed_cookie_sessions(app, db, monkeypatch):
+    from flask.sessions import SecureCookieSessionInterface
+    db.session.add(User(username='voter', email='voter@example.com', phone='0',
+                        password=generate_password_hash('pw'), role='user'))
+    db.session.commit()
+    monkeypatch.setattr(app, 'session_interface', SecureCookieSessionInterface())
+
+    client = app.test_client()
+    response = client.post('/login', data={'username': 'voter', 'password': 'pw'})
+    assert response.status_code == 302
+    assert client.get('/user/dashboard').status_code == 200
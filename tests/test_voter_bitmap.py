@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from models import User, Poll, Candidate, Vote
+from voter_bitmap import VoterBitmaps
+
+
+@pytest.fixture
+def poll(db):
+    now = datetime.utcnow()
+    poll = Poll(title='Open poll', start_time=now - timedelta(days=1), end_time=now + timedelta(days=1))
+    poll.candidates = [Candidate(name='A'), Candidate(name='B')]
+    db.session.add(poll)
+    db.session.add(User(username='voter', email='voter@example.com', phone='0',
+                        password=generate_password_hash('pw'), role='user'))
+    db.session.commit()
+    return poll
+
+
+def other_worker(app):
+    """A second VoterBitmaps over the same directory, as another process would have."""
+    bitmaps = VoterBitmaps()
+    bitmaps.directory = app.config['VOTER_BITMAP_DIR']
+    return bitmaps
+
+
+def test_rebuild_never_clears_a_set_bit_for_other_workers(app, db, poll):
+    mine, theirs = other_worker(app), other_worker(app)
+    mine.mark(poll.id, 7)
+    assert theirs.has_voted(poll.id, 7)
+
+    seen_during_rebuild = []
+
+    def fetch():
+        seen_during_rebuild.append(theirs.has_voted(poll.id, 7))
+        return [7, 9]
+
+    mine._get(poll.id).load(fetch)
+    assert seen_during_rebuild == [True]
+    # The other worker follows the swapped-in file
+    assert theirs.has_voted(poll.id, 9)
+    assert theirs.turnout(poll.id) == 2
+    theirs.mark(poll.id, 11)
+    assert mine.has_voted(poll.id, 11)
+
+
+def test_database_rejects_second_vote_when_bitmap_is_clear(app, db, poll):
+    from voter_bitmap import voter_bitmaps
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'voter', 'password': 'pw'})
+    form = {'poll_id': poll.id, 'candidate_id': poll.candidates[0].id}
+    client.post('/vote', data=form)
+
+    # Lose the bit, e.g. a crash between commit and mark()
+    user_id = User.query.filter_by(username='voter').one().id
+    voter_bitmaps.forget_poll(poll.id)
+    assert not voter_bitmaps.has_voted(poll.id, user_id)
+
+    client.post('/vote', data={**form, 'candidate_id': poll.candidates[1].id})
+    assert Vote.query.filter_by(poll_id=poll.id).count() == 1
+    assert voter_bitmaps.has_voted(poll.id, user_id)
+
+
+def test_second_vote_through_user_vote_is_rejected_cleanly(app, db, poll):
+    from voter_bitmap import voter_bitmaps
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'voter', 'password': 'pw'})
+    form = {'poll_id': poll.id, 'candidate_id': poll.candidates[0].id}
+    client.post('/user/vote', data=form)
+    voter_bitmaps.forget_poll(poll.id)
+
+    response = client.post('/user/vote', data=form)
+    assert response.status_code == 302
+    assert Vote.query.filter_by(poll_id=poll.id).count() == 1
+
+
+def test_voting_twice_through_user_vote_redirects(app, db, poll):
+    client = app.test_client()
+    client.post('/login', data={'username': 'voter', 'password': 'pw'})
+    form = {'poll_id': poll.id, 'candidate_id': poll.candidates[0].id}
+    client.post('/user/vote', data=form)
+
+    # The bitmap answers this one
+    response = client.post('/user/vote', data=form)
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/user/dashboard')
+    assert Vote.query.filter_by(poll_id=poll.id).count() == 1
+
+
+def test_user_vote_with_unknown_poll_redirects(app, db, poll):
+    client = app.test_client()
+    client.post('/login', data={'username': 'voter', 'password': 'pw'})
+    response = client.post('/user/vote', data={'poll_id': 999, 'candidate_id': 999})
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/user/dashboard')
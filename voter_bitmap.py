@@ -0,0 +1,277 @@
+import fcntl
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+
+from fileutil import write_atomic
+from archive import vote_archive
+from models import db, Poll, Vote, PollArchive
+
+
+# ------------------------------
+# File Layout
+# ------------------------------
+# One file per poll: a 16 byte header (magic, flags, voter count) followed by
+# one bit per user id. Files grow in place; a rebuild writes a complete new
+# file, swaps it in with os.replace() and then flags the old one RETIRED, so
+# workers still mapping the old file reopen the path on their next access.
+# A bit is never cleared by a rebuild before its replacement is in place.
+MAGIC = b'VBM1'
+HEADER = struct.Struct('<4sIQ')
+HEADER_SIZE = HEADER.size
+FLAGS = struct.Struct('<I')
+COUNT = struct.Struct('<Q')
+RETIRED = 1
+GROW_STEP = 4096
+
+
+class _PollBitmap:
+    """A memory-mapped voter bitmap for a single poll."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.map = None
+        # flock only excludes other processes; threads share the descriptor
+        self._thread_lock = threading.RLock()
+        self._open()
+
+    def _open(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        file = os.fdopen(fd, 'r+b')
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        try:
+            if os.fstat(file.fileno()).st_size < HEADER_SIZE:
+                file.truncate(HEADER_SIZE + GROW_STEP)
+                file.seek(0)
+                file.write(HEADER.pack(MAGIC, 0, 0))
+                file.flush()
+        finally:
+            fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+        # The old map is left to the garbage collector: a reader on another
+        # thread may still be holding it
+        self.file, self.map = file, mmap.mmap(file.fileno(), 0)
+
+    def _retired(self):
+        return FLAGS.unpack_from(self.map, 4)[0] & RETIRED
+
+    def _follow(self):
+        """Reopen the path if a rebuild has replaced the file we have mapped."""
+        if self._retired():
+            with self._thread_lock:
+                if self._retired():
+                    self._open()
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive lock on the current file, so concurrent workers don't interleave writes."""
+        with self._thread_lock:
+            while True:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+                if not self._retired():
+                    break
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+                self._open()
+            try:
+                yield
+            finally:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+
+    def _remap(self):
+        self.map = mmap.mmap(self.file.fileno(), 0)
+
+    def _ensure_size(self, user_id):
+        """Grow the file (under the lock) so it can hold ``user_id``."""
+        needed = HEADER_SIZE + user_id // 8 + 1
+        size = os.fstat(self.file.fileno()).st_size
+        if size < needed:
+            self.file.truncate(needed + GROW_STEP - needed % GROW_STEP)
+        if len(self.map) < max(needed, size):
+            self._remap()
+
+    def _visible(self, user_id):
+        """Make sure growth done by another worker is mapped here too."""
+        if HEADER_SIZE + user_id // 8 >= len(self.map):
+            if os.fstat(self.file.fileno()).st_size > len(self.map):
+                self._remap()
+        return HEADER_SIZE + user_id // 8 < len(self.map)
+
+    def has_voted(self, user_id):
+        self._follow()
+        if not self._visible(user_id):
+            return False
+        return bool(self.map[HEADER_SIZE + user_id // 8] & (1 << (user_id % 8)))
+
+    def count(self):
+        self._follow()
+        return COUNT.unpack_from(self.map, 8)[0]
+
+    def _set_count(self, value):
+        COUNT.pack_into(self.map, 8, value)
+
+    def mark(self, user_id):
+        """Set the user's bit. Returns False if it was already set."""
+        with self._locked():
+            self._ensure_size(user_id)
+            offset = HEADER_SIZE + user_id // 8
+            bit = 1 << (user_id % 8)
+            if self.map[offset] & bit:
+                return False
+            self.map[offset] |= bit
+            self._set_count(self.count() + 1)
+            return True
+
+    def unmark(self, user_id):
+        with self._locked():
+            if not self._visible(user_id):
+                return False
+            offset = HEADER_SIZE + user_id // 8
+            bit = 1 << (user_id % 8)
+            if not self.map[offset] & bit:
+                return False
+            self.map[offset] &= ~bit & 0xFF
+            self._set_count(self.count() - 1)
+            return True
+
+    def load(self, fetch_user_ids):
+        """Replace the bitmap with the ids returned by ``fetch_user_ids()``.
+
+        The ids are fetched while the lock is held, so a vote marked
+        concurrently lands either in the fetched set or in the new file.
+        """
+        with self._locked():
+            user_ids = set(fetch_user_ids())
+            size = HEADER_SIZE + (max(user_ids) // 8 + 1 if user_ids else 0)
+            data = bytearray(size + GROW_STEP - size % GROW_STEP)
+            HEADER.pack_into(data, 0, MAGIC, 0, len(user_ids))
+            for user_id in user_ids:
+                data[HEADER_SIZE + user_id // 8] |= 1 << (user_id % 8)
+
+            write_atomic(self.path, data)
+            FLAGS.pack_into(self.map, 4, RETIRED)
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+            self._open()
+
+    def user_ids(self):
+        self._follow()
+        size = os.fstat(self.file.fileno()).st_size
+        if size > len(self.map):
+            self._remap()
+        ids = set()
+        for index, byte in enumerate(self.map[HEADER_SIZE:]):
+            if byte:
+                for bit in range(8):
+                    if byte & (1 << bit):
+                        ids.add(index * 8 + bit)
+        return ids
+
+
+# ------------------------------
+# Per-Poll Voter Bitmaps
+# ------------------------------
+class VoterBitmaps:
+    """Answers "has this user voted in this poll?" and turnout from memory.
+
+    The ``vote`` table stays the source of truth: a set bit means the user
+    has voted, but a clear bit only means "ask the database" (the unique
+    user/poll index on ``vote`` rejects the duplicate). Bitmaps are rebuilt
+    from the table on startup and can be checked against it with ``verify()``.
+    """
+
+    def __init__(self, app=None):
+        self.directory = None
+        self._bitmaps = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault(
+            'VOTER_BITMAP_DIR', os.path.join(app.instance_path, 'bitmaps')
+        )
+        self.directory = app.config['VOTER_BITMAP_DIR']
+        os.makedirs(self.directory, exist_ok=True)
+        app.extensions['voter_bitmaps'] = self
+
+    def _get(self, poll_id):
+        poll_id = int(poll_id)
+        bitmap = self._bitmaps.get(poll_id)
+        if bitmap is None:
+            path = os.path.join(self.directory, f'poll_{poll_id}.bits')
+            bitmap = self._bitmaps[poll_id] = _PollBitmap(path)
+        return bitmap
+
+    def has_voted(self, poll_id, user_id):
+        return self._get(poll_id).has_voted(int(user_id))
+
+    def turnout(self, poll_id):
+        return self._get(poll_id).count()
+
+    def mark(self, poll_id, user_id):
+        return self._get(poll_id).mark(int(user_id))
+
+    def forget_poll(self, poll_id):
+        """Clear a deleted poll's bitmap (its id may be reused by SQLite)."""
+        self._get(poll_id).load(set)
+
+    def forget_user(self, user_id):
+        """Clear a deleted user's bits, except in archived polls.
+
+        An archived poll's result is final: the archive file, its vote
+        count and tally keep the user's vote, so the bit stays too.
+        """
+        archived = self._archived_poll_ids()
+        for name in os.listdir(self.directory):
+            if name.startswith('poll_') and name.endswith('.bits'):
+                poll_id = int(name[5:-5])
+                if poll_id not in archived:
+                    self._get(poll_id).unmark(int(user_id))
+
+    def _archived_poll_ids(self):
+        return {poll_id for (poll_id,) in db.session.query(PollArchive.poll_id)}
+
+    def _voters_by_poll(self):
+        voters = {poll_id: set() for (poll_id,) in db.session.query(Poll.id)}
+        rows = db.session.query(Vote.poll_id, Vote.user_id).distinct()
+        for poll_id, user_id in rows:
+            voters.setdefault(poll_id, set()).add(user_id)
+        for poll_id in self._archived_poll_ids():
+            voters.setdefault(poll_id, set()).update(vote_archive.open(poll_id).user_ids.tolist())
+        return voters
+
+    def _voters(self, poll_id, archived=False):
+        user_ids = [user_id for (user_id,) in db.session.query(Vote.user_id).filter(Vote.poll_id == poll_id)]
+        if archived:
+            # Archiving moved these votes out of the vote table
+            user_ids.extend(vote_archive.open(poll_id).user_ids.tolist())
+        return user_ids
+
+    def rebuild_all(self):
+        """Reload every poll's bitmap from the ``vote`` table and the vote archive."""
+        archived = self._archived_poll_ids()
+        poll_ids = {poll_id for (poll_id,) in db.session.query(Poll.id)}
+        for name in os.listdir(self.directory):
+            if name.startswith('poll_') and name.endswith('.bits'):
+                poll_ids.add(int(name[5:-5]))
+        for poll_id in sorted(poll_ids):
+            self._get(poll_id).load(lambda poll_id=poll_id: self._voters(poll_id, poll_id in archived))
+
+    def verify(self):
+        """Compare bitmaps with the ``vote`` table.
+
+        Returns a dict of poll id -> {'missing': [...], 'extra': [...]} for
+        every poll whose bitmap disagrees with the database.
+        """
+        problems = {}
+        for poll_id, user_ids in self._voters_by_poll().items():
+            bitmap = self._get(poll_id)
+            stored = bitmap.user_ids()
+            missing = sorted(user_ids - stored)
+            extra = sorted(stored - user_ids)
+            if missing or extra or bitmap.count() != len(stored):
+                problems[poll_id] = {'missing': missing, 'extra': extra}
+        return problems
+
+
+voter_bitmaps = VoterBitmaps()